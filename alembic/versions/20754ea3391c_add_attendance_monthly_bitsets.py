@@ -0,0 +1,40 @@
+"""Add attendance monthly bitsets
+
+Revision ID: 20754ea3391c
+Revises: 2948f681ca92
+Create Date: 2026-10-18 14:02:11.318254
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '20754ea3391c'
+down_revision: Union[str, None] = '2948f681ca92'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('attendance_monthly', sa.Column('present_bits', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('attendance_monthly', sa.Column('marked_bits', sa.Integer(), server_default='0', nullable=False))
+    # Backfill from existing marks on Postgres; elsewhere run `python analytics.py rebuild`
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute(
+            "UPDATE attendance_monthly SET present_bits = bits.present_bits, marked_bits = bits.marked_bits "
+            "FROM (SELECT student_id, CAST(date_trunc('month', date) AS DATE) AS month, "
+            "SUM(CASE WHEN status = 'present' THEN 1 << (EXTRACT(DAY FROM date)::int - 1) ELSE 0 END) AS present_bits, "
+            "SUM(1 << (EXTRACT(DAY FROM date)::int - 1)) AS marked_bits "
+            "FROM attendance GROUP BY student_id, CAST(date_trunc('month', date) AS DATE)) AS bits "
+            "WHERE attendance_monthly.student_id = bits.student_id AND attendance_monthly.month = bits.month"
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('attendance_monthly', 'marked_bits')
+    op.drop_column('attendance_monthly', 'present_bits')
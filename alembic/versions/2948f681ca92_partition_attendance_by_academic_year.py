@@ -0,0 +1,102 @@
+"""Partition attendance by academic year
+
+Revision ID: 2948f681ca92
+Revises: 1d1ca4e585b5
+Create Date: 2026-10-18 13:21:46.904417
+
+"""
+import os
+from datetime import date
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '2948f681ca92'
+down_revision: Union[str, None] = '1d1ca4e585b5'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Must match partitions.ACADEMIC_YEAR_START_MONTH; upgrade() refuses to run if the environment says otherwise
+ACADEMIC_YEAR_START_MONTH = 8
+
+
+def academic_year(day: date) -> int:
+    return day.year if day.month >= ACADEMIC_YEAR_START_MONTH else day.year - 1
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Declarative partitioning is Postgres-only; other databases keep the plain table
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    configured = int(os.getenv('ACADEMIC_YEAR_START_MONTH', str(ACADEMIC_YEAR_START_MONTH)))
+    if configured != ACADEMIC_YEAR_START_MONTH:
+        raise RuntimeError(
+            f'ACADEMIC_YEAR_START_MONTH is {configured}, but this migration cuts partitions at month '
+            f'{ACADEMIC_YEAR_START_MONTH}; change the migration before running it'
+        )
+
+    op.execute('ALTER TABLE attendance RENAME TO attendance_unpartitioned')
+    op.drop_index('ix_attendance_id', table_name='attendance_unpartitioned')
+    op.drop_index('uq_attendance_student_date', table_name='attendance_unpartitioned')
+
+    # The partition key has to be part of the primary key
+    op.execute(
+        "CREATE TABLE attendance ("
+        " id INTEGER NOT NULL DEFAULT nextval('attendance_id_seq'),"
+        " student_id INTEGER REFERENCES students (id) ON DELETE CASCADE,"
+        " date DATE NOT NULL,"
+        " status VARCHAR NOT NULL,"
+        " PRIMARY KEY (id, date)"
+        ") PARTITION BY RANGE (date)"
+    )
+    op.execute('ALTER SEQUENCE attendance_id_seq OWNED BY attendance.id')
+
+    first_day = op.get_bind().execute(sa.text('SELECT MIN(date) FROM attendance_unpartitioned')).scalar()
+    current = academic_year(date.today())
+    first = academic_year(first_day) if first_day else current
+    for year in range(first, current + 2):
+        start = date(year, ACADEMIC_YEAR_START_MONTH, 1)
+        end = date(year + 1, ACADEMIC_YEAR_START_MONTH, 1)
+        op.execute(
+            f"CREATE TABLE attendance_y{year} PARTITION OF attendance "
+            f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+        )
+    # Safety net for dates outside every yearly partition; creating a partition later moves its rows out of here
+    op.execute('CREATE TABLE attendance_default PARTITION OF attendance DEFAULT')
+
+    op.create_index(op.f('ix_attendance_id'), 'attendance', ['id'], unique=False)
+    op.create_index('uq_attendance_student_date', 'attendance', ['student_id', 'date'], unique=True)
+
+    op.execute(
+        'INSERT INTO attendance (id, student_id, date, status) '
+        'SELECT id, student_id, date, status FROM attendance_unpartitioned'
+    )
+    op.execute('DROP TABLE attendance_unpartitioned')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+
+    op.execute('ALTER TABLE attendance RENAME TO attendance_partitioned')
+    op.create_table('attendance',
+    sa.Column('id', sa.Integer(), server_default=sa.text("nextval('attendance_id_seq')"), nullable=False),
+    sa.Column('student_id', sa.Integer(), nullable=True),
+    sa.Column('date', sa.Date(), nullable=False),
+    sa.Column('status', sa.String(), nullable=False),
+    sa.ForeignKeyConstraint(['student_id'], ['students.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.execute(
+        'INSERT INTO attendance (id, student_id, date, status) '
+        'SELECT id, student_id, date, status FROM attendance_partitioned'
+    )
+    op.execute('ALTER SEQUENCE attendance_id_seq OWNED BY attendance.id')
+    op.execute('DROP TABLE attendance_partitioned')
+    op.create_index(op.f('ix_attendance_id'), 'attendance', ['id'], unique=False)
+    op.create_index('uq_attendance_student_date', 'attendance', ['student_id', 'date'], unique=True)
@@ -0,0 +1,33 @@
+"""Add tombstone owner
+
+Revision ID: 39903f7cc09b
+Revises: 60df45edcdb7
+Create Date: 2026-10-18 17:31:05.774120
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '39903f7cc09b'
+down_revision: Union[str, None] = '60df45edcdb7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Existing tombstones keep NULL owners (their rows are gone) and stay visible to every sync client
+    with op.batch_alter_table('tombstones') as batch_op:
+        batch_op.add_column(sa.Column('teacher_id', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('class_name', sa.String(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('tombstones') as batch_op:
+        batch_op.drop_column('class_name')
+        batch_op.drop_column('teacher_id')
@@ -0,0 +1,59 @@
+"""Backfill sync change_seq
+
+Revision ID: 60df45edcdb7
+Revises: f8693efabb7a
+Create Date: 2026-10-18 17:12:40.218736
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '60df45edcdb7'
+down_revision: Union[str, None] = 'f8693efabb7a'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+SYNCED_TABLES = ('students', 'attendance', 'assessments')
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Rows from before sync tracking all had change_seq 0, and a /sync page never splits a sequence
+    # number, so the first full download returned all of them at once. Give each its own number,
+    # above the current counter, and move the counter past them.
+    bind = op.get_bind()
+    counts = {
+        table: bind.execute(sa.text(f'SELECT COUNT(*) FROM {table} WHERE change_seq = 0')).scalar()
+        for table in SYNCED_TABLES
+    }
+    total = sum(counts.values())
+    if not total:
+        return
+
+    lock = ' FOR UPDATE' if bind.dialect.name == 'postgresql' else ''
+    base = bind.execute(sa.text(f"SELECT version FROM data_versions WHERE scope = 'sync'{lock}")).scalar()
+    if base is None:
+        base = 0
+        bind.execute(sa.text("INSERT INTO data_versions (scope, version) VALUES ('sync', :version)"), {'version': total})
+    else:
+        bind.execute(sa.text("UPDATE data_versions SET version = :version WHERE scope = 'sync'"), {'version': base + total})
+
+    for table in SYNCED_TABLES:
+        if not counts[table]:
+            continue
+        bind.execute(sa.text(
+            f'UPDATE {table} SET change_seq = :base + numbered.position '
+            f'FROM (SELECT id, ROW_NUMBER() OVER (ORDER BY id) AS position FROM {table} WHERE change_seq = 0) AS numbered '
+            f'WHERE {table}.id = numbered.id'
+        ), {'base': base})
+        base += counts[table]
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # Distinct sequence numbers are valid under the previous revision too; nothing to undo
+    pass
@@ -0,0 +1,39 @@
+"""Add query indexes
+
+Revision ID: 980c6863ce07
+Revises: 1247f812391d
+Create Date: 2026-10-18 09:12:41.208734
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '980c6863ce07'
+down_revision: Union[str, None] = '1247f812391d'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Keep the latest mark per student and day so the unique index can be built
+    op.execute(
+        "DELETE FROM attendance WHERE id NOT IN "
+        "(SELECT MAX(id) FROM attendance GROUP BY student_id, date)"
+    )
+    op.create_index(op.f('ix_students_teacher_id'), 'students', ['teacher_id'], unique=False)
+    op.create_index('uq_attendance_student_date', 'attendance', ['student_id', 'date'], unique=True)
+    op.create_index('ix_assessments_student_exam_date', 'assessments', ['student_id', 'exam_date'], unique=False)
+    op.create_index('ix_assessments_subject_exam_date', 'assessments', ['subject', 'exam_date'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_assessments_subject_exam_date', table_name='assessments')
+    op.drop_index('ix_assessments_student_exam_date', table_name='assessments')
+    op.drop_index('uq_attendance_student_date', table_name='attendance')
+    op.drop_index(op.f('ix_students_teacher_id'), table_name='students')
@@ -0,0 +1,60 @@
+"""Add sync tracking
+
+Revision ID: b7d7fb9c9c32
+Revises: 20754ea3391c
+Create Date: 2026-10-18 14:41:37.602915
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7d7fb9c9c32'
+down_revision: Union[str, None] = '20754ea3391c'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+SYNCED_TABLES = ('students', 'attendance', 'assessments')
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Existing rows get change_seq 0, so they are included in every full download (no `since`)
+    for table in SYNCED_TABLES:
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.add_column(sa.Column('updated_at', sa.DateTime(), server_default=sa.func.now(), nullable=False))
+            batch_op.add_column(sa.Column('change_seq', sa.Integer(), server_default='0', nullable=False))
+            batch_op.create_index(f'ix_{table}_change_seq', ['change_seq'], unique=False)
+
+    op.create_table('tombstones',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('entity', sa.String(), nullable=False),
+    sa.Column('entity_id', sa.Integer(), nullable=False),
+    sa.Column('change_seq', sa.Integer(), nullable=False),
+    sa.Column('deleted_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_tombstones_change_seq'), 'tombstones', ['change_seq'], unique=False)
+    op.create_table('sync_operations',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('operation_id', sa.String(), nullable=False),
+    sa.Column('change_seq', sa.Integer(), nullable=False),
+    sa.Column('applied_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('user_id', 'operation_id')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('sync_operations')
+    op.drop_index(op.f('ix_tombstones_change_seq'), table_name='tombstones')
+    op.drop_table('tombstones')
+    for table in reversed(SYNCED_TABLES):
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.drop_index(f'ix_{table}_change_seq')
+            batch_op.drop_column('change_seq')
+            batch_op.drop_column('updated_at')
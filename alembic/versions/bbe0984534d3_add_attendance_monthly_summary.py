@@ -0,0 +1,45 @@
+"""Add attendance monthly summary
+
+Revision ID: bbe0984534d3
+Revises: 980c6863ce07
+Create Date: 2026-10-18 10:03:27.551902
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'bbe0984534d3'
+down_revision: Union[str, None] = '980c6863ce07'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('attendance_monthly',
+    sa.Column('student_id', sa.Integer(), nullable=False),
+    sa.Column('month', sa.Date(), nullable=False),
+    sa.Column('present_count', sa.Integer(), nullable=False),
+    sa.Column('absent_count', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['student_id'], ['students.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('student_id', 'month')
+    )
+    # Backfill from existing marks on Postgres; elsewhere (and to recompute at any time) run `python analytics.py rebuild`
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    op.execute(
+        "INSERT INTO attendance_monthly (student_id, month, present_count, absent_count) "
+        "SELECT student_id, CAST(date_trunc('month', date) AS DATE), "
+        "SUM(CASE WHEN status = 'present' THEN 1 ELSE 0 END), "
+        "SUM(CASE WHEN status = 'absent' THEN 1 ELSE 0 END) "
+        "FROM attendance GROUP BY student_id, CAST(date_trunc('month', date) AS DATE)"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('attendance_monthly')
@@ -0,0 +1,36 @@
+"""Add student search indexes
+
+Revision ID: f8693efabb7a
+Revises: b7d7fb9c9c32
+Create Date: 2026-10-18 16:05:12.481337
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f8693efabb7a'
+down_revision: Union[str, None] = 'b7d7fb9c9c32'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Trigram GIN indexes serve both prefix LIKE and similarity (<%) searches; SQLite uses the in-process index in search.py
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    op.execute('CREATE INDEX ix_students_name_trgm ON students USING gin (lower(name) gin_trgm_ops)')
+    op.execute('CREATE INDEX ix_students_class_name_trgm ON students USING gin (lower(class_name) gin_trgm_ops)')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    op.execute('DROP INDEX IF EXISTS ix_students_class_name_trgm')
+    op.execute('DROP INDEX IF EXISTS ix_students_name_trgm')
@@ -0,0 +1,370 @@
+import argparse
+import asyncio
+import os
+from collections import defaultdict
+from datetime import date, timedelta
+from itertools import groupby
+from typing import List, Literal, Optional
+import numpy as np
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy import Date, Integer, case, cast, delete, extract, func, insert, literal, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from database import SessionLocal, dialect_insert, get_db
+from models import Assessment, Attendance, AttendanceMonthly, Student
+from auth import Principal, get_current_user
+from partitions import academic_year, academic_year_bounds
+from versions import ASSESSMENTS_SCOPE, VersionedCache, get_version
+
+router = APIRouter()
+
+PERCENTILES = (10, 25, 50, 75, 90)
+stats_cache = VersionedCache(int(os.getenv("ASSESSMENT_STATS_CACHE_SIZE", "256")))
+
+def month_start(day: date) -> date:
+    return day.replace(day=1)
+
+# First day of the month for a date column, in the dialect's own SQL
+def month_start_sql(column, dialect_name: str):
+    if dialect_name == "postgresql":
+        return cast(func.date_trunc("month", column), Date)
+    return func.date(column, "start of month")
+
+# Bit for a day within its month's bitset
+def day_bit(day: date) -> int:
+    return 1 << (day.day - 1)
+
+# Bits of `month` that fall between first_day and last_day inclusive
+def days_mask(month: date, first_day: date, last_day: date) -> int:
+    if not month_start(first_day) <= month <= month_start(last_day):
+        return 0
+    low = first_day.day if month_start(first_day) == month else 1
+    high = last_day.day if month_start(last_day) == month else 31
+    return ((1 << high) - 1) & ~((1 << (low - 1)) - 1)
+
+# ✅ Join monthly (month, present_bits, marked_bits) rows into two bitsets where bit i is first_day + i days,
+# so counts, streaks and windows over any day range are popcounts and shifts on a couple of integers.
+def attendance_timeline(rows, first_day: date, last_day: date):
+    present = marked = 0
+    for month, present_bits, marked_bits in rows:
+        mask = days_mask(month, first_day, last_day)
+        # Only a month starting before first_day shifts right, and its masked-off low bits are all zero
+        shift = month.toordinal() - first_day.toordinal()
+        if shift >= 0:
+            present |= (present_bits & mask) << shift
+            marked |= (marked_bits & mask) << shift
+        else:
+            present |= (present_bits & mask) >> -shift
+            marked |= (marked_bits & mask) >> -shift
+    return present, marked
+
+# Present/absent counts, rate and the current run of identical marks (school days without a mark are skipped)
+def timeline_summary(present: int, marked: int) -> dict:
+    present_days = present.bit_count()
+    absent_days = marked.bit_count() - present_days
+    streak = None
+    if marked:
+        latest_present = (present >> (marked.bit_length() - 1)) & 1
+        # The streak is every mark after the most recent mark of the other status
+        other = (marked & ~present) if latest_present else present
+        streak = {"status": "present" if latest_present else "absent", "days": (marked >> other.bit_length()).bit_count()}
+    return {
+        "present": present_days,
+        "absent": absent_days,
+        "rate": round(present_days / (present_days + absent_days), 4) if marked else None,
+        "streak": streak,
+    }
+
+# ✅ Apply counter changes to the monthly summary in the caller's transaction.
+# deltas maps (student_id, month) -> [present_delta, absent_delta, marked_bits, present_bits], where marked_bits
+# are the days being written and present_bits their new values; one upsert covers all of them.
+async def apply_attendance_deltas(db: AsyncSession, deltas: dict):
+    rows = [
+        {
+            "student_id": student_id, "month": month, "present_count": present, "absent_count": absent,
+            "present_bits": present_bits, "marked_bits": marked_bits,
+        }
+        for (student_id, month), (present, absent, marked_bits, present_bits) in deltas.items()
+        if marked_bits
+    ]
+    if not rows:
+        return
+
+    statement = dialect_insert(db, AttendanceMonthly).values(rows)
+    statement = statement.on_conflict_do_update(
+        index_elements=[AttendanceMonthly.student_id, AttendanceMonthly.month],
+        set_={
+            "present_count": AttendanceMonthly.present_count + statement.excluded.present_count,
+            "absent_count": AttendanceMonthly.absent_count + statement.excluded.absent_count,
+            "present_bits": AttendanceMonthly.present_bits
+                .bitwise_and(statement.excluded.marked_bits.bitwise_not())
+                .bitwise_or(statement.excluded.present_bits),
+            "marked_bits": AttendanceMonthly.marked_bits.bitwise_or(statement.excluded.marked_bits),
+        },
+    )
+    await db.execute(statement)
+
+# Build deltas from (student_id, day, old_status, new_status) changes; old_status is None for new marks
+def attendance_deltas(changes) -> dict:
+    deltas = defaultdict(lambda: [0, 0, 0, 0])
+    for student_id, day, old_status, new_status in changes:
+        counters = deltas[(student_id, month_start(day))]
+        counters[2] |= day_bit(day)
+        if old_status == "present":
+            counters[0] -= 1
+        elif old_status == "absent":
+            counters[1] -= 1
+        if new_status == "present":
+            counters[0] += 1
+            counters[3] |= day_bit(day)
+        elif new_status == "absent":
+            counters[1] += 1
+    return deltas
+
+# ✅ Recompute the whole summary table from raw attendance
+async def rebuild_attendance_summary(db: AsyncSession):
+    month = month_start_sql(Attendance.date, db.bind.dialect.name)
+    # One mark per student per day, so summing distinct day bits is the same as OR-ing them
+    bit = literal(1).op("<<")(cast(extract("day", Attendance.date), Integer) - 1)
+    aggregate = select(
+        Attendance.student_id,
+        month,
+        func.sum(case((Attendance.status == "present", 1), else_=0)),
+        func.sum(case((Attendance.status == "absent", 1), else_=0)),
+        func.sum(case((Attendance.status == "present", bit), else_=0)),
+        func.sum(bit),
+    ).group_by(Attendance.student_id, month)
+
+    await db.execute(delete(AttendanceMonthly))
+    await db.execute(
+        insert(AttendanceMonthly).from_select(
+            ["student_id", "month", "present_count", "absent_count", "present_bits", "marked_bits"], aggregate
+        )
+    )
+    await db.commit()
+
+# ✅ Attendance Counts and Rates from the monthly summary (Only for Teachers/Admins)
+# Date ranges are widened to whole months, the summary's granularity.
+@router.get("/analytics/attendance")
+async def attendance_analytics(
+    group_by: Literal["student", "class_name", "month"] = "student",
+    student_id: Optional[int] = None,
+    class_name: Optional[str] = None,
+    teacher_id: Optional[int] = None,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_user),
+):
+    if current_user.role not in ["teacher", "admin"]:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Only teachers and admins can view attendance")
+
+    present = func.sum(AttendanceMonthly.present_count)
+    absent = func.sum(AttendanceMonthly.absent_count)
+    if group_by == "student":
+        keys = [Student.id.label("student_id"), Student.name.label("name"), Student.class_name]
+    elif group_by == "class_name":
+        keys = [Student.class_name]
+    else:
+        keys = [AttendanceMonthly.month]
+
+    query = (
+        select(*keys, present, absent)
+        .join(Student, Student.id == AttendanceMonthly.student_id)
+        .group_by(*keys)
+        .order_by(*keys)
+    )
+    if student_id is not None:
+        query = query.filter(AttendanceMonthly.student_id == student_id)
+    if class_name is not None:
+        query = query.filter(Student.class_name == class_name)
+    if teacher_id is not None:
+        query = query.filter(Student.teacher_id == teacher_id)
+    if date_from is not None:
+        query = query.filter(AttendanceMonthly.month >= month_start(date_from))
+    if date_to is not None:
+        query = query.filter(AttendanceMonthly.month <= month_start(date_to))
+
+    results = []
+    for row in await db.execute(query):
+        *key, present_count, absent_count = row
+        total = present_count + absent_count
+        result = dict(zip([column.key for column in keys], key))
+        result.update({
+            "present": present_count,
+            "absent": absent_count,
+            "rate": round(present_count / total, 4) if total else None,
+        })
+        results.append(result)
+    return results
+
+# Per-student attendance timelines for first_day..last_day from the monthly bitsets:
+# one query reading a few bytes per student per month instead of one row per school day.
+async def student_timelines(db: AsyncSession, first_day: date, last_day: date, student_id=None, class_name=None, teacher_id=None):
+    query = (
+        select(
+            Student.id, Student.name, Student.class_name,
+            AttendanceMonthly.month, AttendanceMonthly.present_bits, AttendanceMonthly.marked_bits,
+        )
+        .join(Student, Student.id == AttendanceMonthly.student_id)
+        .filter(AttendanceMonthly.month >= month_start(first_day), AttendanceMonthly.month <= month_start(last_day))
+        .order_by(Student.class_name, Student.name, Student.id)
+    )
+    if student_id is not None:
+        query = query.filter(Student.id == student_id)
+    if class_name is not None:
+        query = query.filter(Student.class_name == class_name)
+    if teacher_id is not None:
+        query = query.filter(Student.teacher_id == teacher_id)
+
+    rows = (await db.execute(query)).all()
+    timelines = []
+    for (student, name, student_class), group in groupby(rows, key=lambda row: tuple(row[:3])):
+        present, marked = attendance_timeline((row[3:] for row in group), first_day, last_day)
+        timelines.append(({"student_id": student, "name": name, "class_name": student_class}, present, marked))
+    return timelines
+
+# ✅ Exact-Day Attendance Rates and Current Streaks per Student (Only for Teachers/Admins)
+# date_from defaults to the start of the current academic year, date_to to today.
+@router.get("/analytics/attendance/streaks")
+async def attendance_streaks(
+    student_id: Optional[int] = None,
+    class_name: Optional[str] = None,
+    teacher_id: Optional[int] = None,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_user),
+):
+    if current_user.role not in ["teacher", "admin"]:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Only teachers and admins can view attendance")
+
+    date_to = date_to or date.today()
+    date_from = date_from or academic_year_bounds(academic_year(date_to))[0]
+    if date_from > date_to:
+        raise HTTPException(status_code=400, detail="date_from must not be after date_to")
+
+    return [
+        {**student, **timeline_summary(present, marked)}
+        for student, present, marked in await student_timelines(db, date_from, date_to, student_id, class_name, teacher_id)
+    ]
+
+# ✅ Students Absent at Least `absent` of the Last `days` Days (Only for Teachers/Admins)
+@router.get("/analytics/attendance/alerts")
+async def attendance_alerts(
+    absent: int = Query(3, ge=1),
+    days: int = Query(10, ge=1, le=366),
+    class_name: Optional[str] = None,
+    teacher_id: Optional[int] = None,
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_user),
+):
+    if current_user.role not in ["teacher", "admin"]:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Only teachers and admins can view attendance")
+
+    today = date.today()
+    results = []
+    for student, present, marked in await student_timelines(db, today - timedelta(days=days - 1), today, None, class_name, teacher_id):
+        summary = timeline_summary(present, marked)
+        if summary["absent"] >= absent:
+            results.append({**student, **summary})
+    results.sort(key=lambda result: -result["absent"])
+    return results
+
+# Summary statistics from a score frequency table (distinct scores ascending, with their counts).
+# Percentiles use the same linear interpolation as numpy.percentile on the expanded scores.
+def score_statistics(scores: np.ndarray, counts: np.ndarray, bin_width: int) -> dict:
+    total = int(counts.sum())
+    cumulative = np.cumsum(counts)
+    mean = float(np.dot(scores, counts) / total)
+    stddev = float(np.sqrt(np.dot(counts, (scores - mean) ** 2) / total))
+
+    positions = np.array(PERCENTILES) / 100 * (total - 1)
+    lower = scores[np.searchsorted(cumulative, np.floor(positions), side="right")]
+    upper = scores[np.searchsorted(cumulative, np.ceil(positions), side="right")]
+    values = lower + (upper - lower) * (positions - np.floor(positions))
+
+    buckets = scores // bin_width
+    first = int(buckets[0])
+    histogram = np.bincount(buckets - first, weights=counts)
+    return {
+        "count": total,
+        "mean": round(mean, 2),
+        "median": round(float(values[PERCENTILES.index(50)]), 2),
+        "stddev": round(stddev, 2),
+        "min": int(scores[0]),
+        "max": int(scores[-1]),
+        "percentiles": {f"p{p}": round(float(v), 2) for p, v in zip(PERCENTILES, values)},
+        "histogram": [
+            {"start": (first + i) * bin_width, "end": (first + i + 1) * bin_width, "count": int(c)}
+            for i, c in enumerate(histogram)
+        ],
+    }
+
+# ✅ Assessment Score Statistics per subject/class/exam date (Only for Teachers/Admins)
+# SQL reduces the rows to one (group, score, count) row per distinct score; NumPy does the rest.
+# Results are cached until the next assessment write bumps the data version.
+@router.get("/analytics/assessments")
+async def assessment_statistics(
+    group_by: List[Literal["subject", "class_name", "exam_date"]] = Query(["subject"]),
+    subject: Optional[str] = None,
+    class_name: Optional[str] = None,
+    teacher_id: Optional[int] = None,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    bin_width: int = Query(10, ge=1),
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_user),
+):
+    if current_user.role not in ["teacher", "admin"]:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Only teachers and admins can view assessments")
+
+    group_by = list(dict.fromkeys(group_by))
+    cache_key = (tuple(group_by), subject, class_name, teacher_id, date_from, date_to, bin_width)
+    version = await get_version(db, ASSESSMENTS_SCOPE)
+    cached = stats_cache.get(cache_key, version)
+    if cached is not None:
+        return cached
+
+    columns = {"subject": Assessment.subject, "class_name": Student.class_name, "exam_date": Assessment.exam_date}
+    keys = [columns[name] for name in group_by]
+    query = (
+        select(*keys, Assessment.score, func.count())
+        .join(Student, Student.id == Assessment.student_id)
+        .group_by(*keys, Assessment.score)
+        .order_by(*keys, Assessment.score)
+    )
+    if subject is not None:
+        query = query.filter(Assessment.subject == subject)
+    if class_name is not None:
+        query = query.filter(Student.class_name == class_name)
+    if teacher_id is not None:
+        query = query.filter(Student.teacher_id == teacher_id)
+    if date_from is not None:
+        query = query.filter(Assessment.exam_date >= date_from)
+    if date_to is not None:
+        query = query.filter(Assessment.exam_date <= date_to)
+
+    rows = (await db.execute(query)).all()
+    results = []
+    for key, group in groupby(rows, key=lambda row: tuple(row[:len(keys)])):
+        frequencies = np.array([row[len(keys):] for row in group], dtype=np.int64)
+        result = dict(zip(group_by, key))
+        result.update(score_statistics(frequencies[:, 0], frequencies[:, 1], bin_width))
+        results.append(result)
+
+    stats_cache.set(cache_key, version, results)
+    return results
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Attendance analytics maintenance")
+    parser.add_argument("command", choices=["rebuild"], help="rebuild: recompute attendance_monthly from attendance")
+    parser.parse_args()
+
+    async with SessionLocal() as db:
+        await rebuild_attendance_summary(db)
+    print("attendance_monthly rebuilt")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
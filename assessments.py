@@ -1,21 +1,33 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from database import SessionLocal
-from models import Assessment, Student, User
-from auth import get_current_user
-from pydantic import BaseModel
+import csv
+import io
+from fastapi import APIRouter, Depends, File, HTTPException, Query, Request, UploadFile, status
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload
+from database import get_db
+from replicas import get_read_db
+from models import Assessment, Student, Tombstone
+from auth import Principal, get_current_user
+from pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, paginate
+from responses import ORJSONResponse
+from versions import (
+    ASSESSMENTS_SCOPE,
+    PENDING_CHANGE_SEQ,
+    bump_version,
+    etag_headers,
+    etag_matches,
+    get_version,
+    make_etag,
+    not_modified,
+    stamp_change_seq,
+    student_assessments_scope,
+)
+from pydantic import BaseModel, ValidationError
 from datetime import date
+from typing import List, Optional
 
 router = APIRouter()
 
-# Dependency to get DB Session
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
 # ✅ Pydantic Model for Assessment Data
 class AssessmentCreate(BaseModel):
     student_id: int
@@ -23,54 +35,184 @@ class AssessmentCreate(BaseModel):
     score: int
     exam_date: date
 
+# ✅ Response Models for Assessments
+class AssessmentOut(BaseModel):
+    id: int
+    student_id: int
+    subject: str
+    score: int
+    exam_date: date
+
+class AssessmentPage(BaseModel):
+    items: List[AssessmentOut]
+    next_cursor: Optional[str] = None
+
+IMPORT_COLUMNS = ("student_id", "subject", "score", "exam_date")
+IMPORT_BATCH_SIZE = 1000
+MAX_REPORTED_ERRORS = 100
+
 # ✅ Create Assessment (Only for Teachers/Admins)
 @router.post("/assessments/")
-def create_assessment(assessment: AssessmentCreate, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+async def create_assessment(assessment: AssessmentCreate, db: AsyncSession = Depends(get_db), current_user: Principal = Depends(get_current_user)):
     if current_user.role not in ["teacher", "admin"]:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Only teachers and admins can add assessments")
 
-    student = db.query(Student).filter(Student.id == assessment.student_id).first()
+    student = await db.scalar(select(Student).filter(Student.id == assessment.student_id))
     if not student:
         raise HTTPException(status_code=404, detail="Student not found")
 
-    new_assessment = Assessment(**assessment.dict())
+    new_assessment = Assessment(**assessment.dict(), change_seq=PENDING_CHANGE_SEQ)
     db.add(new_assessment)
-    db.commit()
-    db.refresh(new_assessment)
+    await bump_version(db, ASSESSMENTS_SCOPE, student_assessments_scope(assessment.student_id))
+    await stamp_change_seq(db, Assessment)
+    await db.commit()
+    await db.refresh(new_assessment)
 
     return {"message": "Assessment added successfully", "assessment_id": new_assessment.id}
 
-# ✅ Get All Assessments (Only for Teachers/Admins)
-@router.get("/assessments/")
-def get_assessments(db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+# ✅ Bulk Import Assessments from a CSV upload (Only for Teachers/Admins)
+# Rows are parsed one at a time from the spooled upload and inserted in batches, all in one transaction.
+@router.post("/assessments/import")
+async def import_assessments(file: UploadFile = File(...), db: AsyncSession = Depends(get_db), current_user: Principal = Depends(get_current_user)):
+    if current_user.role not in ["teacher", "admin"]:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Only teachers and admins can add assessments")
+
+    reader = csv.DictReader(io.TextIOWrapper(file.file, encoding="utf-8-sig", newline=""))
+    try:
+        fieldnames = reader.fieldnames or []
+    except (UnicodeDecodeError, csv.Error) as exc:
+        raise HTTPException(status_code=400, detail=f"Could not parse CSV: {exc}")
+    missing = [column for column in IMPORT_COLUMNS if column not in fieldnames]
+    if missing:
+        raise HTTPException(status_code=400, detail=f"CSV is missing columns: {', '.join(missing)}")
+
+    summary = {"accepted": 0, "rejected": 0, "errors": []}
+    known_students = set()
+    touched_scopes = set()
+
+    def reject(line: int, detail: str):
+        summary["rejected"] += 1
+        if len(summary["errors"]) < MAX_REPORTED_ERRORS:
+            summary["errors"].append({"line": line, "detail": detail})
+
+    async def flush(batch):
+        # Resolve every student id in the batch with one query
+        unresolved = {row.student_id for _, row in batch} - known_students
+        if unresolved:
+            known_students.update(await db.scalars(select(Student.id).filter(Student.id.in_(unresolved))))
+
+        rows = []
+        for line, row in batch:
+            if row.student_id in known_students:
+                rows.append({**row.dict(), "change_seq": PENDING_CHANGE_SEQ})
+            else:
+                reject(line, "Student not found")
+        if rows:
+            await db.execute(insert(Assessment).values(rows))
+            touched_scopes.update(student_assessments_scope(row["student_id"]) for row in rows)
+            summary["accepted"] += len(rows)
+
+    try:
+        batch = []
+        for record in reader:
+            try:
+                batch.append((reader.line_num, AssessmentCreate(**{column: record.get(column) for column in IMPORT_COLUMNS})))
+            except ValidationError as exc:
+                reject(reader.line_num, "; ".join(f"{error['loc'][0]}: {error['msg']}" for error in exc.errors()))
+            if len(batch) >= IMPORT_BATCH_SIZE:
+                await flush(batch)
+                batch = []
+        if batch:
+            await flush(batch)
+        if summary["accepted"]:
+            # Every version row is bumped in one sorted statement, in the same lock order as single-assessment writes
+            await bump_version(db, ASSESSMENTS_SCOPE, *touched_scopes)
+            await stamp_change_seq(db, Assessment)
+        await db.commit()
+    except (UnicodeDecodeError, csv.Error) as exc:
+        await db.rollback()
+        raise HTTPException(status_code=400, detail=f"Could not parse CSV: {exc}")
+
+    return {"message": "Assessments imported", **summary}
+
+# ✅ Get Assessments, newest exam first, one page at a time (Only for Teachers/Admins)
+@router.get("/assessments/", response_model=AssessmentPage, response_class=ORJSONResponse)
+async def get_assessments(
+    request: Request,
+    student_id: Optional[int] = None,
+    class_name: Optional[str] = None,
+    teacher_id: Optional[int] = None,
+    subject: Optional[str] = None,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    db: AsyncSession = Depends(get_read_db),
+    current_user: Principal = Depends(get_current_user),
+):
     if current_user.role not in ["teacher", "admin"]:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Only teachers and admins can view assessments")
 
-    return db.query(Assessment).all()
+    # A single student's list is versioned, so unchanged pages can be answered with 304
+    headers = None
+    if student_id is not None:
+        scope = student_assessments_scope(student_id)
+        etag = make_etag(scope, await get_version(db, scope), request.url.query)
+        if etag_matches(request, etag):
+            return not_modified(etag)
+        headers = etag_headers(etag)
+
+    query = select(Assessment.id, Assessment.student_id, Assessment.subject, Assessment.score, Assessment.exam_date)
+    if student_id is not None:
+        query = query.filter(Assessment.student_id == student_id)
+    if subject is not None:
+        query = query.filter(Assessment.subject == subject)
+    if class_name is not None or teacher_id is not None:
+        query = query.join(Student, Student.id == Assessment.student_id)
+        if class_name is not None:
+            query = query.filter(Student.class_name == class_name)
+        if teacher_id is not None:
+            query = query.filter(Student.teacher_id == teacher_id)
+    if date_from is not None:
+        query = query.filter(Assessment.exam_date >= date_from)
+    if date_to is not None:
+        query = query.filter(Assessment.exam_date <= date_to)
+
+    return ORJSONResponse(await paginate(db, query, Assessment.exam_date, Assessment.id, cursor, limit), headers=headers)
 
 # ✅ Update Assessment Score (Only for Teachers/Admins)
 @router.put("/assessments/{assessment_id}")
-def update_assessment(assessment_id: int, new_score: int, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
-    assessment = db.query(Assessment).filter(Assessment.id == assessment_id).first()
+async def update_assessment(assessment_id: int, new_score: int, db: AsyncSession = Depends(get_db), current_user: Principal = Depends(get_current_user)):
+    assessment = await db.scalar(select(Assessment).filter(Assessment.id == assessment_id))
     if not assessment:
         raise HTTPException(status_code=404, detail="Assessment not found")
 
     assessment.score = new_score
-    db.commit()
+    assessment.change_seq = PENDING_CHANGE_SEQ
+    await bump_version(db, ASSESSMENTS_SCOPE, student_assessments_scope(assessment.student_id))
+    await stamp_change_seq(db, Assessment)
+    await db.commit()
 
     return {"message": "Assessment updated successfully"}
 
 # ✅ Delete an Assessment (Only for Admins)
 @router.delete("/assessments/{assessment_id}")
-def delete_assessment(assessment_id: int, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+async def delete_assessment(assessment_id: int, db: AsyncSession = Depends(get_db), current_user: Principal = Depends(get_current_user)):
     if current_user.role != "admin":
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Only admins can delete assessments")
 
-    assessment = db.query(Assessment).filter(Assessment.id == assessment_id).first()
+    assessment = await db.scalar(select(Assessment).options(joinedload(Assessment.student)).filter(Assessment.id == assessment_id))
     if not assessment:
         raise HTTPException(status_code=404, detail="Assessment not found")
 
-    db.delete(assessment)
-    db.commit()
+    await db.delete(assessment)
+    db.add(Tombstone(
+        entity="assessments", entity_id=assessment_id,
+        teacher_id=assessment.student.teacher_id, class_name=assessment.student.class_name,
+        change_seq=PENDING_CHANGE_SEQ,
+    ))
+    await bump_version(db, ASSESSMENTS_SCOPE, student_assessments_scope(assessment.student_id))
+    await stamp_change_seq(db, Tombstone)
+    await db.commit()
 
     return {"message": "Assessment deleted successfully"}
@@ -1,48 +1,216 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from database import SessionLocal
-from models import Attendance, Student, User
-from auth import get_current_user
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from sqlalchemy import insert, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from database import get_db
+from replicas import get_read_db
+from models import Attendance, Student
+from auth import Principal, get_current_user
+from analytics import apply_attendance_deltas, attendance_deltas
+from coalescing import ATTENDANCE_COALESCE_ENABLED, attendance_coalescer
+from pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, paginate
+from responses import ORJSONResponse
+from versions import (
+    PENDING_CHANGE_SEQ,
+    bump_version,
+    etag_headers,
+    etag_matches,
+    get_version,
+    make_etag,
+    not_modified,
+    stamp_change_seq,
+    student_attendance_scope,
+)
 from pydantic import BaseModel
 from datetime import date
+from typing import List, Literal, Optional
 
 router = APIRouter()
 
-# Dependency to get DB Session
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
 # ✅ Pydantic Model for Attendance Data
 class AttendanceCreate(BaseModel):
     student_id: int
     date: date
-    status: str  # "present" or "absent"
+    status: Literal["present", "absent"]
+
+VALID_STATUSES = ("present", "absent")
+
+# ✅ Response Models for Attendance
+class AttendanceOut(BaseModel):
+    id: int
+    student_id: int
+    date: date
+    status: str
+
+class AttendancePage(BaseModel):
+    items: List[AttendanceOut]
+    next_cursor: Optional[str] = None
+
+# ✅ Pydantic Models for marking a whole class in one request
+class AttendanceMark(BaseModel):
+    student_id: int
+    status: str
+
+class BulkAttendanceCreate(BaseModel):
+    class_name: str
+    date: date
+    records: List[AttendanceMark]
 
 # ✅ Mark Student Attendance (Only for Teachers/Admins)
+# With ATTENDANCE_COALESCE_ENABLED, concurrent marks are group-committed; the reply still waits for the commit.
 @router.post("/attendance/")
-def mark_attendance(attendance: AttendanceCreate, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+async def mark_attendance(attendance: AttendanceCreate, db: AsyncSession = Depends(get_db), current_user: Principal = Depends(get_current_user)):
     if current_user.role not in ["teacher", "admin"]:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Only teachers and admins can mark attendance")
 
-    student = db.query(Student).filter(Student.id == attendance.student_id).first()
+    if ATTENDANCE_COALESCE_ENABLED:
+        await attendance_coalescer.submit(attendance)
+        return {"message": "Attendance marked successfully"}
+
+    student = await db.scalar(select(Student).filter(Student.id == attendance.student_id))
     if not student:
         raise HTTPException(status_code=404, detail="Student not found")
 
-    new_attendance = Attendance(**attendance.dict())
+    new_attendance = Attendance(**attendance.dict(), change_seq=PENDING_CHANGE_SEQ)
     db.add(new_attendance)
-    db.commit()
-    db.refresh(new_attendance)
+    try:
+        await db.flush()
+        await apply_attendance_deltas(db, attendance_deltas([(attendance.student_id, attendance.date, None, attendance.status)]))
+        await bump_version(db, student_attendance_scope(attendance.student_id))
+        await stamp_change_seq(db, Attendance)
+        await db.commit()
+    except IntegrityError:
+        await db.rollback()
+        raise HTTPException(status_code=409, detail="Attendance already marked for this student on this date")
+    await db.refresh(new_attendance)
 
     return {"message": "Attendance marked successfully"}
 
-# ✅ Get Student Attendance (Only for Teachers/Admins)
-@router.get("/attendance/")
-def get_attendance(db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+# ✅ Mark Attendance for a Whole Class (Only for Teachers/Admins)
+# Re-submitting the same class/date updates the existing marks instead of duplicating them.
+@router.post("/attendance/bulk")
+async def mark_attendance_bulk(payload: BulkAttendanceCreate, db: AsyncSession = Depends(get_db), current_user: Principal = Depends(get_current_user)):
+    if current_user.role not in ["teacher", "admin"]:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Only teachers and admins can mark attendance")
+
+    student_ids = {record.student_id for record in payload.records}
+
+    # One query to validate every student on the roster
+    class_by_student = dict(
+        (await db.execute(select(Student.id, Student.class_name).filter(Student.id.in_(student_ids)))).all()
+    ) if student_ids else {}
+
+    errors = []
+    marks = {}
+    for index, record in enumerate(payload.records):
+        if record.status not in VALID_STATUSES:
+            errors.append({"index": index, "student_id": record.student_id, "detail": "Status must be 'present' or 'absent'"})
+        elif record.student_id not in class_by_student:
+            errors.append({"index": index, "student_id": record.student_id, "detail": "Student not found"})
+        elif class_by_student[record.student_id] != payload.class_name:
+            errors.append({"index": index, "student_id": record.student_id, "detail": f"Student is not in class {payload.class_name}"})
+        elif record.student_id in marks:
+            errors.append({"index": index, "student_id": record.student_id, "detail": "Duplicate student in request"})
+        else:
+            marks[record.student_id] = record.status
+
+    # One query for marks already recorded that day, so re-submissions update in place
+    existing = {
+        student_id: (attendance_id, current_status)
+        for student_id, attendance_id, current_status in (await db.execute(
+            select(Attendance.student_id, Attendance.id, Attendance.status)
+            .filter(Attendance.date == payload.date, Attendance.student_id.in_(marks))
+        )).all()
+    } if marks else {}
+
+    new_rows = [
+        {"student_id": student_id, "date": payload.date, "status": mark, "change_seq": PENDING_CHANGE_SEQ}
+        for student_id, mark in marks.items()
+        if student_id not in existing
+    ]
+    try:
+        if new_rows:
+            await db.execute(insert(Attendance).values(new_rows))
+
+        # At most one UPDATE per status value, skipping marks that didn't change
+        for mark in VALID_STATUSES:
+            ids = [
+                existing[student_id][0]
+                for student_id, value in marks.items()
+                if value == mark and student_id in existing and existing[student_id][1] != mark
+            ]
+            if ids:
+                # The date predicate confines the update to a single partition
+                await db.execute(
+                    update(Attendance)
+                    .where(Attendance.date == payload.date, Attendance.id.in_(ids))
+                    .values(status=mark, change_seq=PENDING_CHANGE_SEQ)
+                    .execution_options(synchronize_session=False)
+                )
+
+        await apply_attendance_deltas(db, attendance_deltas(
+            (student_id, payload.date, existing[student_id][1] if student_id in existing else None, mark)
+            for student_id, mark in marks.items()
+        ))
+        await bump_version(db, *(
+            student_attendance_scope(student_id)
+            for student_id, mark in marks.items()
+            if student_id not in existing or existing[student_id][1] != mark
+        ))
+        if marks:
+            await stamp_change_seq(db, Attendance)
+        await db.commit()
+    except IntegrityError:
+        # Another request marked some of these students between our read and write
+        await db.rollback()
+        raise HTTPException(status_code=409, detail="Attendance was marked concurrently, please resubmit")
+
+    return {
+        "message": "Attendance marked successfully",
+        "date": payload.date,
+        "created": len(new_rows),
+        "updated": len(marks) - len(new_rows),
+        "errors": errors,
+    }
+
+# ✅ Get Student Attendance, newest first, one page at a time (Only for Teachers/Admins)
+@router.get("/attendance/", response_model=AttendancePage, response_class=ORJSONResponse)
+async def get_attendance(
+    request: Request,
+    student_id: Optional[int] = None,
+    class_name: Optional[str] = None,
+    teacher_id: Optional[int] = None,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    db: AsyncSession = Depends(get_read_db),
+    current_user: Principal = Depends(get_current_user),
+):
     if current_user.role not in ["teacher", "admin"]:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Only teachers and admins can view attendance")
 
-    return db.query(Attendance).all()
+    # A single student's list is versioned, so unchanged pages can be answered with 304
+    headers = None
+    if student_id is not None:
+        scope = student_attendance_scope(student_id)
+        etag = make_etag(scope, await get_version(db, scope), request.url.query)
+        if etag_matches(request, etag):
+            return not_modified(etag)
+        headers = etag_headers(etag)
+
+    query = select(Attendance.id, Attendance.student_id, Attendance.date, Attendance.status)
+    if student_id is not None:
+        query = query.filter(Attendance.student_id == student_id)
+    if class_name is not None or teacher_id is not None:
+        query = query.join(Student, Student.id == Attendance.student_id)
+        if class_name is not None:
+            query = query.filter(Student.class_name == class_name)
+        if teacher_id is not None:
+            query = query.filter(Student.teacher_id == teacher_id)
+    if date_from is not None:
+        query = query.filter(Attendance.date >= date_from)
+    if date_to is not None:
+        query = query.filter(Attendance.date <= date_to)
+
+    return ORJSONResponse(await paginate(db, query, Attendance.date, Attendance.id, cursor, limit), headers=headers)
@@ -1,10 +1,18 @@
+import asyncio
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
 from datetime import datetime, timedelta
 from typing import Optional
 from passlib.context import CryptContext
 from jose import JWTError, jwt
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
+from sqlalchemy import event, inspect, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from database import SessionLocal
 from models import User
 
@@ -13,32 +21,116 @@ SECRET_KEY = "your_secret_key"
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
-# Password hashing
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Principal cache: avoids a users lookup on every authenticated request
+PRINCIPAL_CACHE_SIZE = int(os.getenv("PRINCIPAL_CACHE_SIZE", "1024"))
+PRINCIPAL_CACHE_TTL_SECONDS = float(os.getenv("PRINCIPAL_CACHE_TTL_SECONDS", "60"))
+# When enabled, tokens carrying uid/name/role claims skip the cache and the database entirely
+TRUST_TOKEN_CLAIMS = os.getenv("TRUST_TOKEN_CLAIMS", "false").lower() == "true"
+
+# Password hashing: changing BCRYPT_ROUNDS makes existing hashes get rehashed on next login
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(os.cpu_count() or 2)))
+PASSWORD_HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", "64"))
+
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__rounds=BCRYPT_ROUNDS,
+    bcrypt__min_rounds=BCRYPT_ROUNDS,
+    bcrypt__max_rounds=BCRYPT_ROUNDS,
+)
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
-# Get database session
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
-# Hash password
-def get_password_hash(password: str) -> str:
-    return pwd_context.hash(password)
-
-# Verify password
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
-
-# Authenticate user
-def authenticate_user(db: Session, email: str, password: str):
-    user = db.query(User).filter(User.email == email).first()
-    if not user or not verify_password(password, user.hashed_password):
-        return None
-    return user
+# The fields routes need from the authenticated user
+@dataclass(frozen=True)
+class Principal:
+    id: int
+    name: str
+    email: str
+    role: str
+
+# Bounded LRU cache of principals keyed by email, with a TTL per entry.
+# Each worker process has its own cache; the TTL bounds staleness across processes.
+class PrincipalCache:
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, email: str) -> Optional[Principal]:
+        with self._lock:
+            entry = self._entries.get(email)
+            if entry is None:
+                return None
+            principal, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._entries[email]
+                return None
+            self._entries.move_to_end(email)
+            return principal
+
+    def set(self, principal: Principal):
+        with self._lock:
+            self._entries[principal.email] = (principal, time.monotonic() + self.ttl)
+            self._entries.move_to_end(principal.email)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, email: str):
+        with self._lock:
+            self._entries.pop(email, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+principal_cache = PrincipalCache(PRINCIPAL_CACHE_SIZE, PRINCIPAL_CACHE_TTL_SECONDS)
+
+# Drop cached principals whenever a user row is changed or deleted through the ORM
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def invalidate_user(mapper, connection, target):
+    for email in {target.email, *inspect(target).attrs.email.history.deleted}:
+        principal_cache.invalidate(email)
+
+# Runs bcrypt on a dedicated, size-limited thread pool (bcrypt releases the GIL),
+# so login storms can't occupy the request threadpool or the event loop.
+# Callers beyond max_pending get a 503 straight away instead of queueing.
+class PasswordHasher:
+    def __init__(self, workers: int, max_pending: int):
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="password-hash")
+        self._max_pending = max_pending
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    async def _run(self, fn, *args):
+        with self._lock:
+            if self._pending >= self._max_pending:
+                raise HTTPException(
+                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    detail="Server is busy, please retry shortly",
+                    headers={"Retry-After": "1"},
+                )
+            self._pending += 1
+        try:
+            return await asyncio.wrap_future(self._executor.submit(fn, *args))
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    async def hash(self, password: str) -> str:
+        return await self._run(pwd_context.hash, password)
+
+    # Returns (valid, new_hash); new_hash is set when the stored hash uses an outdated cost
+    async def verify_and_update(self, plain_password: str, hashed_password: str):
+        return await self._run(pwd_context.verify_and_update, plain_password, hashed_password)
+
+password_hasher = PasswordHasher(PASSWORD_HASH_WORKERS, PASSWORD_HASH_MAX_PENDING)
+
+# Look up a user by email
+async def get_user_by_email(db: AsyncSession, email: str) -> Optional[User]:
+    return await db.scalar(select(User).filter(User.email == email))
 
 # Create JWT token
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
@@ -55,8 +147,8 @@ def decode_access_token(token: str):
     except JWTError:
         return None
 
-# Get current user
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+# Get current user (a database session is only opened on a cache miss)
+async def get_current_user(token: str = Depends(oauth2_scheme)) -> Principal:
     credentials_exception = HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials")
     payload = decode_access_token(token)
     if not payload:
@@ -64,7 +156,16 @@ def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(
     email: str = payload.get("sub")
     if email is None:
         raise credentials_exception
-    user = db.query(User).filter(User.email == email).first()
-    if user is None:
-        raise credentials_exception
-    return user
+
+    if TRUST_TOKEN_CLAIMS and all(claim in payload for claim in ("uid", "name", "role")):
+        return Principal(id=payload["uid"], name=payload["name"], email=email, role=payload["role"])
+
+    principal = principal_cache.get(email)
+    if principal is None:
+        async with SessionLocal() as db:
+            user = (await db.execute(select(User.id, User.name, User.email, User.role).filter(User.email == email))).first()
+        if user is None:
+            raise credentials_exception
+        principal = Principal(id=user.id, name=user.name, email=user.email, role=user.role)
+        principal_cache.set(principal)
+    return principal
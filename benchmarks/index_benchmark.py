@@ -0,0 +1,195 @@
+"""Compare query plans and latency with and without the query indexes.
+
+Seeds a database with teachers, students, attendance and assessments, runs
+the queries the list routes issue with the indexes from migration
+980c6863ce07 dropped, then again with them in place.
+
+    python benchmarks/index_benchmark.py --url sqlite:///index_bench.db --students 2000 --days 180
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+BENCHMARKED_INDEXES = {
+    "ix_students_teacher_id",
+    "uq_attendance_student_date",
+    "ix_assessments_student_exam_date",
+    "ix_assessments_subject_exam_date",
+}
+SUBJECTS = ["math", "science", "english", "history", "art"]
+STUDENTS_PER_CLASS = 30
+BATCH_SIZE = 5000
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="sqlite:///index_bench.db", help="sync SQLAlchemy URL (the database is wiped)")
+    parser.add_argument("--students", type=int, default=2000)
+    parser.add_argument("--days", type=int, default=180, help="days of attendance per student")
+    parser.add_argument("--exams", type=int, default=6, help="exams per subject per student")
+    parser.add_argument("--repeat", type=int, default=50, help="runs per query")
+    return parser.parse_args()
+
+
+def insert_in_batches(conn, table, rows):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= BATCH_SIZE:
+            conn.execute(table.insert(), batch)
+            batch = []
+    if batch:
+        conn.execute(table.insert(), batch)
+
+
+def seed(engine, args, models):
+    start_date = date(2024, 1, 1)
+    teachers = max(1, args.students // STUDENTS_PER_CLASS)
+    with engine.begin() as conn:
+        insert_in_batches(conn, models.User.__table__, (
+            {"id": t + 1, "name": f"Teacher {t}", "email": f"teacher{t}@example.com", "hashed_password": "x", "role": "teacher"}
+            for t in range(teachers)
+        ))
+        insert_in_batches(conn, models.Student.__table__, (
+            {"id": s + 1, "name": f"Student {s}", "class_name": f"class-{s // STUDENTS_PER_CLASS}", "teacher_id": s // STUDENTS_PER_CLASS + 1}
+            for s in range(args.students)
+        ))
+        insert_in_batches(conn, models.Attendance.__table__, (
+            {"student_id": s + 1, "date": start_date + timedelta(days=d), "status": "present" if random.random() < 0.9 else "absent"}
+            for s in range(args.students)
+            for d in range(args.days)
+        ))
+        insert_in_batches(conn, models.Assessment.__table__, (
+            {"student_id": s + 1, "subject": subject, "score": random.randint(0, 100),
+             "exam_date": start_date + timedelta(days=e * max(1, args.days // args.exams))}
+            for s in range(args.students)
+            for subject in SUBJECTS
+            for e in range(args.exams)
+        ))
+    return teachers, start_date
+
+
+def build_queries(args, models, teachers, start_date):
+    from sqlalchemy import select
+    Student, Attendance, Assessment = models.Student, models.Attendance, models.Assessment
+    window = timedelta(days=30)
+
+    def random_day():
+        return start_date + timedelta(days=random.randrange(args.days))
+
+    return {
+        "students by teacher": lambda: select(Student).where(Student.teacher_id == random.randint(1, teachers)),
+        "attendance page for student": lambda: (
+            select(Attendance)
+            .where(Attendance.student_id == random.randint(1, args.students), Attendance.date >= random_day())
+            .order_by(Attendance.date.desc(), Attendance.id.desc())
+            .limit(100)
+        ),
+        "attendance for class on a day": lambda: (
+            select(Attendance)
+            .join(Student, Student.id == Attendance.student_id)
+            .where(Student.teacher_id == random.randint(1, teachers), Attendance.date == random_day())
+        ),
+        "assessments page for student": lambda: (
+            select(Assessment)
+            .where(Assessment.student_id == random.randint(1, args.students))
+            .order_by(Assessment.exam_date.desc(), Assessment.id.desc())
+            .limit(100)
+        ),
+        "assessments by subject window": lambda: (
+            select(Assessment)
+            .where(Assessment.subject == random.choice(SUBJECTS), Assessment.exam_date.between(start_date, start_date + window))
+            .order_by(Assessment.exam_date.desc(), Assessment.id.desc())
+            .limit(100)
+        ),
+    }
+
+
+def explain(conn, statement):
+    from sqlalchemy import text
+    sql = str(statement.compile(conn.engine, compile_kwargs={"literal_binds": True}))
+    backend = conn.engine.url.get_backend_name()
+    if backend == "sqlite":
+        return [row[-1] for row in conn.execute(text("EXPLAIN QUERY PLAN " + sql))]
+    if backend == "postgresql":
+        return [row[0] for row in conn.execute(text("EXPLAIN " + sql))]
+    return []
+
+
+def run(engine, queries, repeat):
+    results = {}
+    with engine.connect() as conn:
+        for name, make_query in queries.items():
+            random.seed(name)
+            timings = []
+            for _ in range(repeat):
+                statement = make_query()
+                start = time.perf_counter()
+                conn.execute(statement).fetchall()
+                timings.append((time.perf_counter() - start) * 1000)
+            timings.sort()
+            results[name] = {
+                "p50_ms": statistics.median(timings),
+                "p95_ms": timings[min(len(timings) - 1, int(len(timings) * 0.95))],
+                "plan": explain(conn, make_query()),
+            }
+    return results
+
+
+def report(before, after):
+    for name in before:
+        b, a = before[name], after[name]
+        speedup = b["p50_ms"] / a["p50_ms"] if a["p50_ms"] else float("inf")
+        print(f"\n== {name}")
+        print(f"   without indexes: p50 {b['p50_ms']:8.3f} ms  p95 {b['p95_ms']:8.3f} ms")
+        print(f"   with indexes:    p50 {a['p50_ms']:8.3f} ms  p95 {a['p95_ms']:8.3f} ms  ({speedup:.1f}x)")
+        print("   plan without: " + " | ".join(b["plan"]))
+        print("   plan with:    " + " | ".join(a["plan"]))
+
+
+def main():
+    args = parse_args()
+    os.environ.setdefault("DATABASE_URL", args.url)
+
+    from sqlalchemy import create_engine, text
+    import models
+
+    engine = create_engine(args.url)
+    models.Base.metadata.drop_all(engine)
+    models.Base.metadata.create_all(engine)
+
+    random.seed(0)
+    print(f"Seeding {args.students} students x {args.days} days ...")
+    teachers, start_date = seed(engine, args, models)
+    queries = build_queries(args, models, teachers, start_date)
+
+    indexes = [
+        index
+        for table in models.Base.metadata.sorted_tables
+        for index in table.indexes
+        if index.name in BENCHMARKED_INDEXES
+    ]
+
+    for index in indexes:
+        index.drop(engine)
+    with engine.begin() as conn:
+        conn.execute(text("ANALYZE"))
+    before = run(engine, queries, args.repeat)
+
+    for index in indexes:
+        index.create(engine)
+    with engine.begin() as conn:
+        conn.execute(text("ANALYZE"))
+    after = run(engine, queries, args.repeat)
+
+    report(before, after)
+
+
+if __name__ == "__main__":
+    main()
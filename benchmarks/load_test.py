@@ -0,0 +1,279 @@
+"""In-process load test for the FastAPI app.
+
+Seeds a database (SQLite by default, or any URL the app supports), runs
+main.app in-process behind an httpx ASGI transport and drives a weighted
+mix of login, roster, attendance marking and list calls from concurrent
+virtual users. Reports throughput and p50/p95/p99 per route, optionally
+saves the results as JSON and compares them with a saved baseline.
+
+    python benchmarks/load_test.py --teachers 20 --students-per-teacher 30 --years 1 --duration 30 --output baseline.json
+    python benchmarks/load_test.py ... --baseline baseline.json --max-regression 0.2
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+from collections import defaultdict
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from index_benchmark import insert_in_batches
+
+PASSWORD = "benchmark-password"
+SCHOOL_DAYS_PER_YEAR = 180
+SUBJECTS = ["math", "science", "english", "history", "art"]
+
+# Relative weight of each operation in the request mix
+WORKLOAD = {
+    "POST /token": 2,
+    "GET /students/": 30,
+    "POST /attendance/bulk": 10,
+    "GET /attendance/?student_id": 20,
+    "GET /assessments/?class_name": 15,
+    "GET /analytics/attendance": 10,
+    "GET /analytics/assessments": 8,
+    "GET /teacher/dashboard": 5,
+}
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="sqlite:///load_bench.db", help="sync SQLAlchemy URL (the database is wiped)")
+    parser.add_argument("--teachers", type=int, default=20)
+    parser.add_argument("--students-per-teacher", type=int, default=30)
+    parser.add_argument("--years", type=float, default=1, help="school years of attendance history")
+    parser.add_argument("--users", type=int, default=20, help="concurrent virtual users")
+    parser.add_argument("--duration", type=float, default=30, help="measured seconds")
+    parser.add_argument("--warmup", type=float, default=3, help="unmeasured seconds before measuring")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write results as JSON to this file")
+    parser.add_argument("--baseline", help="compare against results JSON from an earlier run")
+    parser.add_argument("--max-regression", type=float, help="exit 1 if any route's p95 grows by more than this fraction")
+    return parser.parse_args()
+
+
+def school_days(years: float):
+    day = date.today() - timedelta(days=int(years * 365))
+    days = []
+    while len(days) < int(years * SCHOOL_DAYS_PER_YEAR) and day < date.today():
+        if day.weekday() < 5:
+            days.append(day)
+        day += timedelta(days=1)
+    return days
+
+
+def seed(args, models, hashed_password):
+    from sqlalchemy import create_engine
+
+    engine = create_engine(args.url)
+    models.Base.metadata.drop_all(engine)
+    models.Base.metadata.create_all(engine)
+
+    days = school_days(args.years)
+    students = args.teachers * args.students_per_teacher
+    with engine.begin() as conn:
+        insert_in_batches(conn, models.User.__table__, (
+            {"id": t + 1, "name": f"Teacher {t}", "email": f"teacher{t}@example.com", "hashed_password": hashed_password, "role": "teacher"}
+            for t in range(args.teachers)
+        ))
+        insert_in_batches(conn, models.Student.__table__, (
+            {"id": s + 1, "name": f"Student {s}", "class_name": f"class-{s // args.students_per_teacher}",
+             "teacher_id": s // args.students_per_teacher + 1}
+            for s in range(students)
+        ))
+        insert_in_batches(conn, models.Attendance.__table__, (
+            {"student_id": s + 1, "date": day, "status": "present" if random.random() < 0.9 else "absent"}
+            for s in range(students)
+            for day in days
+        ))
+        insert_in_batches(conn, models.Assessment.__table__, (
+            {"student_id": s + 1, "subject": subject, "score": random.randint(0, 100), "exam_date": days[i]}
+            for s in range(students)
+            for subject in SUBJECTS
+            for i in range(0, len(days), 30)
+        ))
+    engine.dispose()
+    return days
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.recording = False
+
+    def record(self, route, seconds, ok):
+        if not self.recording:
+            return
+        self.latencies[route].append(seconds * 1000)
+        if not ok:
+            self.errors[route] += 1
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * fraction))]
+
+
+async def virtual_user(client, args, days, recorder, stop_at, rng):
+    teacher = rng.randrange(args.teachers)
+    email = f"teacher{teacher}@example.com"
+    class_name = f"class-{teacher}"
+    first_student = teacher * args.students_per_teacher + 1
+
+    async def login():
+        response = await client.post("/token", data={"username": email, "password": PASSWORD})
+        return response, response.json().get("access_token") if response.status_code == 200 else None
+
+    response, token = await login()
+    if token is None:
+        raise RuntimeError(f"login failed during setup: {response.status_code} {response.text}")
+    headers = {"Authorization": f"Bearer {token}"}
+
+    routes = list(WORKLOAD)
+    weights = [WORKLOAD[route] for route in routes]
+    while time.monotonic() < stop_at:
+        route = rng.choices(routes, weights)[0]
+        start = time.perf_counter()
+        if route == "POST /token":
+            response, _ = await login()
+        elif route == "GET /students/":
+            response = await client.get("/students/", headers=headers)
+        elif route == "POST /attendance/bulk":
+            records = [
+                {"student_id": first_student + i, "status": "present" if rng.random() < 0.9 else "absent"}
+                for i in range(args.students_per_teacher)
+            ]
+            response = await client.post("/attendance/bulk", headers=headers, json={
+                "class_name": class_name, "date": rng.choice(days[-20:]).isoformat(), "records": records,
+            })
+        elif route == "GET /attendance/?student_id":
+            response = await client.get("/attendance/", headers=headers, params={
+                "student_id": first_student + rng.randrange(args.students_per_teacher), "limit": 50,
+            })
+        elif route == "GET /assessments/?class_name":
+            response = await client.get("/assessments/", headers=headers, params={"class_name": class_name, "limit": 100})
+        elif route == "GET /analytics/attendance":
+            response = await client.get("/analytics/attendance", headers=headers, params={"teacher_id": teacher + 1})
+        elif route == "GET /analytics/assessments":
+            response = await client.get("/analytics/assessments", headers=headers, params={"class_name": class_name})
+        else:
+            response = await client.get("/teacher/dashboard", headers=headers)
+        recorder.record(route, time.perf_counter() - start, response.status_code < 400)
+
+
+async def run_load(args, days):
+    import httpx
+    from main import app
+
+    recorder = Recorder()
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://benchmark") as client:
+        start = time.monotonic()
+        stop_at = start + args.warmup + args.duration
+        users = [
+            asyncio.create_task(virtual_user(client, args, days, recorder, stop_at, random.Random(args.seed + i)))
+            for i in range(args.users)
+        ]
+        await asyncio.sleep(args.warmup)
+        recorder.recording = True
+        measured_from = time.monotonic()
+        await asyncio.gather(*users)
+        elapsed = time.monotonic() - measured_from
+
+    routes = {}
+    for route, values in sorted(recorder.latencies.items()):
+        values.sort()
+        routes[route] = {
+            "requests": len(values),
+            "errors": recorder.errors[route],
+            "rps": round(len(values) / elapsed, 2),
+            "p50_ms": round(percentile(values, 0.50), 3),
+            "p95_ms": round(percentile(values, 0.95), 3),
+            "p99_ms": round(percentile(values, 0.99), 3),
+        }
+    total = sum(route["requests"] for route in routes.values())
+    return {
+        "config": {key: value for key, value in vars(args).items() if key not in ("output", "baseline", "max_regression")},
+        "elapsed_s": round(elapsed, 3),
+        "total_rps": round(total / elapsed, 2),
+        "routes": routes,
+    }
+
+
+def print_results(results):
+    print(f"\n{'route':32} {'reqs':>7} {'err':>5} {'rps':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for route, r in results["routes"].items():
+        print(f"{route:32} {r['requests']:7} {r['errors']:5} {r['rps']:8.1f} {r['p50_ms']:9.2f} {r['p95_ms']:9.2f} {r['p99_ms']:9.2f}")
+    print(f"\ntotal: {results['total_rps']:.1f} req/s over {results['elapsed_s']:.1f}s")
+
+
+# Prints per-route changes against a baseline and returns the worst p95 growth
+def compare(results, baseline):
+    print(f"\n{'route':32} {'rps':>16} {'p50 ms':>20} {'p95 ms':>20}")
+    worst = 0.0
+    for route, current in results["routes"].items():
+        previous = baseline["routes"].get(route)
+        if previous is None:
+            print(f"{route:32} (new route)")
+            continue
+        cells = []
+        for key in ("rps", "p50_ms", "p95_ms"):
+            change = (current[key] - previous[key]) / previous[key] if previous[key] else 0.0
+            cells.append(f"{previous[key]:.1f}->{current[key]:.1f} {change:+.0%}")
+        if previous["p95_ms"]:
+            worst = max(worst, (current["p95_ms"] - previous["p95_ms"]) / previous["p95_ms"])
+        print(f"{route:32} {cells[0]:>16} {cells[1]:>20} {cells[2]:>20}")
+    print(f"\ntotal rps: {baseline['total_rps']:.1f} -> {results['total_rps']:.1f}")
+    return worst
+
+
+def main():
+    args = parse_args()
+    os.environ["DATABASE_URL"] = args.url
+    # Every virtual user logs in from the same address; measure the app, not the auth rate limiter
+    os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+    random.seed(args.seed)
+
+    import models
+    from auth import pwd_context
+
+    students = args.teachers * args.students_per_teacher
+    print(f"Seeding {args.teachers} teachers, {students} students, {args.years} years of attendance ...")
+    days = seed(args, models, pwd_context.hash(PASSWORD))
+
+    async def prepare_and_run():
+        from analytics import rebuild_attendance_summary
+        from database import SessionLocal, get_engine
+
+        async with SessionLocal() as db:
+            await rebuild_attendance_summary(db)
+        print(f"Running {args.users} users for {args.warmup:.0f}s warmup + {args.duration:.0f}s ...")
+        try:
+            return await run_load(args, days)
+        finally:
+            await get_engine().dispose()
+
+    results = asyncio.run(prepare_and_run())
+    print_results(results)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"results written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            worst = compare(results, json.load(f))
+        if args.max_regression is not None and worst > args.max_regression:
+            print(f"p95 regression {worst:.0%} exceeds {args.max_regression:.0%}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
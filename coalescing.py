@@ -0,0 +1,132 @@
+import asyncio
+import contextvars
+import logging
+import os
+from fastapi import HTTPException
+from sqlalchemy import insert, select
+from sqlalchemy.exc import IntegrityError
+from database import SessionLocal
+from models import Attendance, Student
+from analytics import apply_attendance_deltas, attendance_deltas
+from versions import PENDING_CHANGE_SEQ, bump_version, stamp_change_seq, student_attendance_scope
+
+logger = logging.getLogger(__name__)
+
+# Opt-in group commit for POST /attendance/: marks arriving within the wait window share one transaction
+ATTENDANCE_COALESCE_ENABLED = os.getenv("ATTENDANCE_COALESCE_ENABLED", "false").lower() == "true"
+ATTENDANCE_COALESCE_MAX_WAIT_MS = float(os.getenv("ATTENDANCE_COALESCE_MAX_WAIT_MS", "5"))
+ATTENDANCE_COALESCE_MAX_BATCH = int(os.getenv("ATTENDANCE_COALESCE_MAX_BATCH", "200"))
+
+def student_not_found():
+    return HTTPException(status_code=404, detail="Student not found")
+
+def already_marked():
+    return HTTPException(status_code=409, detail="Attendance already marked for this student on this date")
+
+# ✅ Insert single attendance marks as one multi-row INSERT and one commit.
+# Returns one outcome per mark: None when written, otherwise the HTTPException for that caller.
+async def write_marks(db, marks):
+    student_ids = {mark.student_id for mark in marks}
+    known = set(await db.scalars(select(Student.id).filter(Student.id.in_(student_ids))))
+    taken = set((await db.execute(
+        select(Attendance.student_id, Attendance.date)
+        .filter(Attendance.student_id.in_(student_ids), Attendance.date.in_({mark.date for mark in marks}))
+    )).all())
+
+    outcomes = []
+    accepted = []
+    for mark in marks:
+        if mark.student_id not in known:
+            outcomes.append(student_not_found())
+        elif (mark.student_id, mark.date) in taken:
+            outcomes.append(already_marked())
+        else:
+            taken.add((mark.student_id, mark.date))
+            accepted.append(mark)
+            outcomes.append(None)
+    if not accepted:
+        return outcomes
+
+    await db.execute(insert(Attendance).values([{**mark.dict(), "change_seq": PENDING_CHANGE_SEQ} for mark in accepted]))
+    await apply_attendance_deltas(db, attendance_deltas((mark.student_id, mark.date, None, mark.status) for mark in accepted))
+    await bump_version(db, *(student_attendance_scope(mark.student_id) for mark in accepted))
+    await stamp_change_seq(db, Attendance)
+    await db.commit()
+    return outcomes
+
+
+# ✅ Micro-batching writer: callers wait on a future that resolves only after their batch has committed.
+# A single flusher per event loop takes whatever is queued (up to max_batch), waiting at most max_wait
+# for more; marks queue up while a flush is in progress, so batches grow with load.
+class AttendanceCoalescer:
+    def __init__(self, max_wait_ms: float, max_batch: int):
+        self.max_wait = max_wait_ms / 1000
+        self.max_batch = max_batch
+        self._loop = None
+        self._queue = None
+
+    def _ensure_started(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is loop:
+            return
+        self._loop = loop
+        self._queue = asyncio.Queue()
+        # Started from an empty context so the flush's SQL isn't billed to whichever request came first
+        contextvars.Context().run(loop.create_task, self._run())
+
+    async def submit(self, mark):
+        self._ensure_started()
+        future = self._loop.create_future()
+        await self._queue.put((mark, future))
+        error = await future
+        if error is not None:
+            raise error
+
+    async def _run(self):
+        while True:
+            batch = [await self._queue.get()]
+            deadline = self._loop.time() + self.max_wait
+            while len(batch) < self.max_batch:
+                remaining = deadline - self._loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+            # The flusher must outlive any one batch, or every later submit() waits forever
+            try:
+                await self._flush(batch)
+            except Exception:
+                logger.exception("coalesced attendance flush of %d marks failed", len(batch))
+            finally:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_result(HTTPException(status_code=500, detail="Attendance could not be saved"))
+
+    async def _flush(self, batch):
+        marks = [mark for mark, _ in batch]
+        try:
+            async with SessionLocal() as db:
+                outcomes = await write_marks(db, marks)
+        except IntegrityError:
+            # A concurrent writer took one of these (student, date) pairs; fall back to one transaction per mark
+            outcomes = [await self._write_one(mark) for mark in marks]
+        except Exception as exc:
+            logger.exception("coalesced attendance flush of %d marks failed", len(batch))
+            outcomes = [exc] * len(batch)
+        for (_, future), outcome in zip(batch, outcomes):
+            if not future.done():
+                future.set_result(outcome)
+
+    async def _write_one(self, mark):
+        try:
+            async with SessionLocal() as db:
+                return (await write_marks(db, [mark]))[0]
+        except IntegrityError:
+            return already_marked()
+        except Exception as exc:
+            logger.exception("attendance mark for student %s failed", mark.student_id)
+            return exc
+
+attendance_coalescer = AttendanceCoalescer(ATTENDANCE_COALESCE_MAX_WAIT_MS, ATTENDANCE_COALESCE_MAX_BATCH)
@@ -0,0 +1,180 @@
+import csv
+import io
+import os
+from datetime import date
+from typing import Literal, Optional
+from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+from database import SessionLocal
+from models import Assessment, Attendance, Student
+from auth import Principal, get_current_user
+
+router = APIRouter()
+
+# Rows fetched per server-side cursor batch; each batch becomes one CSV chunk or one Parquet row group
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "10000"))
+
+# Column names with their Arrow types, in output order
+ATTENDANCE_COLUMNS = [
+    ("id", "int64"), ("student_id", "int64"), ("student_name", "string"),
+    ("class_name", "string"), ("date", "date32"), ("status", "string"),
+]
+ASSESSMENT_COLUMNS = [
+    ("id", "int64"), ("student_id", "int64"), ("student_name", "string"), ("class_name", "string"),
+    ("subject", "string"), ("score", "int64"), ("exam_date", "date32"),
+]
+
+MEDIA_TYPES = {"csv": "text/csv", "parquet": "application/vnd.apache.parquet"}
+
+# Growable in-memory sink that pyarrow writes into and we drain after every row group
+class _DrainableSink(io.RawIOBase):
+    def __init__(self):
+        self._buffer = bytearray()
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._buffer += data
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def drain(self) -> bytes:
+        data = bytes(self._buffer)
+        self._buffer.clear()
+        return data
+
+async def stream_rows(query, session_factory=SessionLocal):
+    # A dedicated session: the pooled connection is held only while rows are being streamed
+    async with session_factory() as db:
+        result = await db.stream(query.execution_options(yield_per=EXPORT_BATCH_SIZE))
+        async for partition in result.partitions():
+            yield partition
+
+async def csv_chunks(query, columns, session_factory=SessionLocal):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow([name for name, _ in columns])
+    async for rows in stream_rows(query, session_factory):
+        writer.writerows(rows)
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+async def parquet_chunks(query, columns, session_factory=SessionLocal):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema([(name, pa.type_for_alias(type_name)) for name, type_name in columns])
+    sink = _DrainableSink()
+    writer = pq.ParquetWriter(sink, schema, compression="snappy")
+
+    # Encoding is CPU-bound, so each row group is written off the event loop
+    def write_row_group(rows):
+        arrays = [pa.array(values, type=field.type) for values, field in zip(zip(*rows), schema)]
+        writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+
+    async for rows in stream_rows(query, session_factory):
+        await run_in_threadpool(write_row_group, rows)
+        yield sink.drain()
+    await run_in_threadpool(writer.close)
+    yield sink.drain()
+
+def require_parquet_support():
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        raise HTTPException(status_code=status.HTTP_501_NOT_IMPLEMENTED, detail="Parquet export requires pyarrow")
+
+def export_chunks(query, columns, format: str, session_factory=SessionLocal):
+    if format == "parquet":
+        return parquet_chunks(query, columns, session_factory)
+    return csv_chunks(query, columns, session_factory)
+
+def export_response(query, columns, format: str, name: str):
+    if format == "parquet":
+        require_parquet_support()
+    chunks = export_chunks(query, columns, format)
+    return StreamingResponse(
+        chunks,
+        media_type=MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{name}.{format}"'},
+    )
+
+def attendance_export_query(class_name=None, teacher_id=None, date_from=None, date_to=None):
+    query = (
+        select(Attendance.id, Attendance.student_id, Student.name, Student.class_name, Attendance.date, Attendance.status)
+        .join(Student, Student.id == Attendance.student_id)
+        .order_by(Attendance.date, Attendance.id)
+    )
+    if class_name is not None:
+        query = query.filter(Student.class_name == class_name)
+    if teacher_id is not None:
+        query = query.filter(Student.teacher_id == teacher_id)
+    if date_from is not None:
+        query = query.filter(Attendance.date >= date_from)
+    if date_to is not None:
+        query = query.filter(Attendance.date <= date_to)
+    return query
+
+def assessment_export_query(class_name=None, teacher_id=None, subject=None, date_from=None, date_to=None):
+    query = (
+        select(
+            Assessment.id, Assessment.student_id, Student.name, Student.class_name,
+            Assessment.subject, Assessment.score, Assessment.exam_date,
+        )
+        .join(Student, Student.id == Assessment.student_id)
+        .order_by(Assessment.exam_date, Assessment.id)
+    )
+    if class_name is not None:
+        query = query.filter(Student.class_name == class_name)
+    if teacher_id is not None:
+        query = query.filter(Student.teacher_id == teacher_id)
+    if subject is not None:
+        query = query.filter(Assessment.subject == subject)
+    if date_from is not None:
+        query = query.filter(Assessment.exam_date >= date_from)
+    if date_to is not None:
+        query = query.filter(Assessment.exam_date <= date_to)
+    return query
+
+# ✅ Export Attendance as CSV or Parquet (Only for Teachers/Admins)
+@router.get("/export/attendance")
+async def export_attendance(
+    format: Literal["csv", "parquet"] = "csv",
+    class_name: Optional[str] = None,
+    teacher_id: Optional[int] = None,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    current_user: Principal = Depends(get_current_user),
+):
+    if current_user.role not in ["teacher", "admin"]:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Only teachers and admins can export attendance")
+
+    query = attendance_export_query(class_name, teacher_id, date_from, date_to)
+    return export_response(query, ATTENDANCE_COLUMNS, format, "attendance")
+
+# ✅ Export Assessments as CSV or Parquet (Only for Teachers/Admins)
+@router.get("/export/assessments")
+async def export_assessments(
+    format: Literal["csv", "parquet"] = "csv",
+    class_name: Optional[str] = None,
+    teacher_id: Optional[int] = None,
+    subject: Optional[str] = None,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    current_user: Principal = Depends(get_current_user),
+):
+    if current_user.role not in ["teacher", "admin"]:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Only teachers and admins can export assessments")
+
+    query = assessment_export_query(class_name, teacher_id, subject, date_from, date_to)
+    return export_response(query, ASSESSMENT_COLUMNS, format, "assessments")
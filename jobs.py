@@ -0,0 +1,315 @@
+import asyncio
+import json
+import logging
+import os
+import re
+import threading
+import uuid
+from collections import OrderedDict, defaultdict, deque
+from dataclasses import asdict, dataclass, field
+from datetime import date, datetime
+from typing import Literal, Optional
+import orjson
+from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import FileResponse
+from pydantic import BaseModel, ValidationError
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from database import DB_POOL_PRE_PING, DB_POOL_RECYCLE, get_engine
+from models import Assessment, Student
+from auth import Principal, get_current_user
+from analytics import rebuild_attendance_summary, student_timelines, timeline_summary
+from exports import (
+    ASSESSMENT_COLUMNS,
+    ATTENDANCE_COLUMNS,
+    MEDIA_TYPES,
+    assessment_export_query,
+    attendance_export_query,
+    export_chunks,
+    require_parquet_support,
+)
+from partitions import academic_year, academic_year_bounds
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+# Worker threads, each with its own event loop and a one-connection engine, so reports never
+# take the request event loop or the request connection pool
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+# Submissions beyond this many queued jobs get a 503
+JOB_MAX_PENDING = int(os.getenv("JOB_MAX_PENDING", "100"))
+JOB_RESULT_DIR = os.getenv("JOB_RESULT_DIR", "job_results")
+# Finished jobs kept in memory; older ones are still found through their metadata file
+JOB_HISTORY_SIZE = int(os.getenv("JOB_HISTORY_SIZE", "1000"))
+JOB_ID_PATTERN = re.compile(r"[0-9a-f]{32}")
+
+# ✅ Pydantic Models for job parameters, one per job type
+class AttendanceExportParams(BaseModel):
+    format: Literal["csv", "parquet"] = "csv"
+    class_name: Optional[str] = None
+    teacher_id: Optional[int] = None
+    date_from: Optional[date] = None
+    date_to: Optional[date] = None
+
+class AssessmentExportParams(AttendanceExportParams):
+    subject: Optional[str] = None
+
+class ReportCardParams(BaseModel):
+    class_name: Optional[str] = None
+    teacher_id: Optional[int] = None
+    date_from: Optional[date] = None
+    date_to: Optional[date] = None
+
+class RebuildParams(BaseModel):
+    pass
+
+class JobSubmit(BaseModel):
+    type: Literal["attendance_export", "assessment_export", "report_cards", "rebuild_attendance_summary"]
+    params: dict = {}
+
+def result_path(job_id: str, extension: str) -> str:
+    return os.path.join(JOB_RESULT_DIR, f"{job_id}.{extension}")
+
+async def write_chunks(path: str, chunks):
+    # Blocking writes are fine here: the worker loop runs nothing but this job
+    with open(path, "wb") as f:
+        async for chunk in chunks:
+            f.write(chunk)
+
+# Job handlers take (session_factory, params, job_id) and return (result file, media type)
+async def run_attendance_export(session_factory, params: AttendanceExportParams, job_id: str):
+    query = attendance_export_query(params.class_name, params.teacher_id, params.date_from, params.date_to)
+    path = result_path(job_id, params.format)
+    await write_chunks(path, export_chunks(query, ATTENDANCE_COLUMNS, params.format, session_factory))
+    return path, MEDIA_TYPES[params.format]
+
+async def run_assessment_export(session_factory, params: AssessmentExportParams, job_id: str):
+    query = assessment_export_query(params.class_name, params.teacher_id, params.subject, params.date_from, params.date_to)
+    path = result_path(job_id, params.format)
+    await write_chunks(path, export_chunks(query, ASSESSMENT_COLUMNS, params.format, session_factory))
+    return path, MEDIA_TYPES[params.format]
+
+# ✅ Term report cards: attendance and per-subject results for every student in scope.
+# The term defaults to the academic year containing date_to (today if omitted).
+async def run_report_cards(session_factory, params: ReportCardParams, job_id: str):
+    date_to = params.date_to or date.today()
+    date_from = params.date_from or academic_year_bounds(academic_year(date_to))[0]
+
+    students = select(Student.id, Student.name, Student.class_name).order_by(Student.class_name, Student.name, Student.id)
+    scores = (
+        select(
+            Assessment.student_id, Assessment.subject, func.count(),
+            func.avg(Assessment.score), func.min(Assessment.score), func.max(Assessment.score),
+        )
+        .join(Student, Student.id == Assessment.student_id)
+        .filter(Assessment.exam_date >= date_from, Assessment.exam_date <= date_to)
+        .group_by(Assessment.student_id, Assessment.subject)
+    )
+    if params.class_name is not None:
+        students = students.filter(Student.class_name == params.class_name)
+        scores = scores.filter(Student.class_name == params.class_name)
+    if params.teacher_id is not None:
+        students = students.filter(Student.teacher_id == params.teacher_id)
+        scores = scores.filter(Student.teacher_id == params.teacher_id)
+
+    async with session_factory() as db:
+        cards = {
+            row.id: {"student_id": row.id, "name": row.name, "class_name": row.class_name, "attendance": None, "subjects": {}}
+            for row in await db.execute(students)
+        }
+        for student, present, marked in await student_timelines(db, date_from, date_to, None, params.class_name, params.teacher_id):
+            cards[student["student_id"]]["attendance"] = timeline_summary(present, marked)
+        for student_id, subject, count, average, lowest, highest in await db.execute(scores):
+            cards[student_id]["subjects"][subject] = {
+                "count": count, "average": round(float(average), 2), "min": lowest, "max": highest,
+            }
+
+    path = result_path(job_id, "json")
+    with open(path, "wb") as f:
+        f.write(orjson.dumps({"date_from": date_from, "date_to": date_to, "students": list(cards.values())}))
+    return path, "application/json"
+
+async def run_rebuild_attendance_summary(session_factory, params: RebuildParams, job_id: str):
+    async with session_factory() as db:
+        await rebuild_attendance_summary(db)
+    path = result_path(job_id, "json")
+    with open(path, "wb") as f:
+        f.write(orjson.dumps({"rebuilt": "attendance_monthly"}))
+    return path, "application/json"
+
+@dataclass(frozen=True)
+class JobType:
+    run: object
+    params: type
+    roles: tuple
+    # Jobs of this type allowed to run at the same time; the rest wait in the queue
+    concurrency: int
+
+JOB_TYPES = {
+    "attendance_export": JobType(run_attendance_export, AttendanceExportParams, ("teacher", "admin"), 2),
+    "assessment_export": JobType(run_assessment_export, AssessmentExportParams, ("teacher", "admin"), 2),
+    "report_cards": JobType(run_report_cards, ReportCardParams, ("teacher", "admin"), 1),
+    "rebuild_attendance_summary": JobType(run_rebuild_attendance_summary, RebuildParams, ("admin",), 1),
+}
+
+@dataclass
+class Job:
+    id: str
+    type: str
+    user_id: int
+    params: dict
+    status: str = "queued"  # queued, running, succeeded, failed
+    submitted_at: datetime = field(default_factory=datetime.utcnow)
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    error: Optional[str] = None
+    result_file: Optional[str] = None
+    media_type: Optional[str] = None
+
+    def public(self) -> dict:
+        return {
+            "job_id": self.id, "type": self.type, "status": self.status, "submitted_at": self.submitted_at,
+            "started_at": self.started_at, "finished_at": self.finished_at, "error": self.error,
+            "result_url": f"/jobs/{self.id}/result" if self.status == "succeeded" else None,
+        }
+
+
+# ✅ In-process job queue with a bounded worker pool and per-type concurrency limits.
+# Workers start on the first submission. Finished jobs are also written to <JOB_RESULT_DIR>/<id>.meta.json,
+# so their status and results survive restarts and can be read by any process sharing the directory.
+class JobQueue:
+    def __init__(self, workers: int, max_pending: int, history_size: int):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.history_size = history_size
+        self._pending = deque()
+        self._running = defaultdict(int)
+        self._jobs = OrderedDict()
+        self._condition = threading.Condition()
+        self._threads = []
+
+    def _ensure_started(self):
+        if self._threads:
+            return
+        os.makedirs(JOB_RESULT_DIR, exist_ok=True)
+        for index in range(self.workers):
+            thread = threading.Thread(target=self._work, name=f"job-worker-{index}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def submit(self, job_type: str, params: BaseModel, user_id: int) -> Job:
+        job = Job(id=uuid.uuid4().hex, type=job_type, user_id=user_id, params=params.dict())
+        with self._condition:
+            if len(self._pending) >= self.max_pending:
+                raise HTTPException(
+                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    detail="Too many queued jobs, please retry later",
+                    headers={"Retry-After": "30"},
+                )
+            self._ensure_started()
+            self._jobs[job.id] = job
+            self._pending.append(job)
+            self._condition.notify_all()
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        if not JOB_ID_PATTERN.fullmatch(job_id):
+            return None
+        with self._condition:
+            job = self._jobs.get(job_id)
+        if job is not None:
+            return job
+        try:
+            with open(result_path(job_id, "meta.json")) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        for key in ("submitted_at", "started_at", "finished_at"):
+            data[key] = datetime.fromisoformat(data[key]) if data[key] else None
+        return Job(**data)
+
+    # Oldest queued job whose type is below its concurrency limit; blocks until there is one
+    def _take(self) -> Job:
+        with self._condition:
+            while True:
+                for job in self._pending:
+                    if self._running[job.type] < JOB_TYPES[job.type].concurrency:
+                        self._pending.remove(job)
+                        self._running[job.type] += 1
+                        job.status = "running"
+                        job.started_at = datetime.utcnow()
+                        return job
+                self._condition.wait()
+
+    def _finish(self, job: Job):
+        job.finished_at = datetime.utcnow()
+        with open(result_path(job.id, "meta.json"), "w") as f:
+            json.dump(asdict(job), f, default=str)
+        with self._condition:
+            self._running[job.type] -= 1
+            finished = [key for key, value in self._jobs.items() if value.status in ("succeeded", "failed")]
+            for key in finished[:max(0, len(finished) - self.history_size)]:
+                del self._jobs[key]
+            self._condition.notify_all()
+
+    def _work(self):
+        asyncio.run(self._work_loop())
+
+    async def _work_loop(self):
+        engine = create_async_engine(
+            get_engine().url, pool_size=1, max_overflow=0, pool_pre_ping=DB_POOL_PRE_PING, pool_recycle=DB_POOL_RECYCLE,
+        )
+        session_factory = async_sessionmaker(bind=engine, autoflush=False, expire_on_commit=False)
+        while True:
+            # Waiting blocks this worker's loop, which has nothing else to do between jobs
+            job = self._take()
+            job_type = JOB_TYPES[job.type]
+            try:
+                job.result_file, job.media_type = await job_type.run(session_factory, job_type.params(**job.params), job.id)
+                job.status = "succeeded"
+            except Exception as exc:
+                logger.exception("job %s (%s) failed", job.id, job.type)
+                job.status = "failed"
+                job.error = str(exc) or exc.__class__.__name__
+            finally:
+                self._finish(job)
+
+job_queue = JobQueue(JOB_WORKERS, JOB_MAX_PENDING, JOB_HISTORY_SIZE)
+
+def get_own_job(job_id: str, current_user: Principal) -> Job:
+    job = job_queue.get(job_id)
+    if job is None or (job.user_id != current_user.id and current_user.role != "admin"):
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+# ✅ Submit a Background Job (Teachers/Admins; rebuilding analytics is Admin only)
+@router.post("/jobs", status_code=status.HTTP_202_ACCEPTED)
+async def submit_job(payload: JobSubmit, current_user: Principal = Depends(get_current_user)):
+    job_type = JOB_TYPES[payload.type]
+    if current_user.role not in job_type.roles:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Access denied")
+    try:
+        params = job_type.params(**payload.params)
+    except ValidationError as exc:
+        raise RequestValidationError(exc.errors())
+    if getattr(params, "format", None) == "parquet":
+        require_parquet_support()
+
+    return job_queue.submit(payload.type, params, current_user.id).public()
+
+# ✅ Job Status (Submitter or Admin)
+@router.get("/jobs/{job_id}")
+async def job_status(job_id: str, current_user: Principal = Depends(get_current_user)):
+    return get_own_job(job_id, current_user).public()
+
+# ✅ Download a Finished Job's Result (Submitter or Admin)
+@router.get("/jobs/{job_id}/result")
+async def job_result(job_id: str, current_user: Principal = Depends(get_current_user)):
+    job = get_own_job(job_id, current_user)
+    if job.status != "succeeded":
+        raise HTTPException(status_code=409, detail=f"Job is {job.status}")
+    if not os.path.exists(job.result_file):
+        raise HTTPException(status_code=410, detail="Job result is no longer available")
+    return FileResponse(job.result_file, media_type=job.media_type, filename=f"{job.type}{os.path.splitext(job.result_file)[1]}")
@@ -0,0 +1,201 @@
+import logging
+import os
+import random
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict
+from contextvars import ContextVar
+from typing import Optional
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+from sqlalchemy import event
+from database import get_engine, pool_stats
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+# Requests issuing more SQL statements than this are flagged as likely N+1 patterns
+QUERY_COUNT_THRESHOLD = int(os.getenv("QUERY_COUNT_THRESHOLD", "20"))
+# Opt-in sampling profiler: profile this fraction of requests, keep reports for those slower than the threshold
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_SLOW_MS = float(os.getenv("PROFILE_SLOW_MS", "500"))
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+# SQL statement count and DB time for the request being handled
+class RequestStats:
+    __slots__ = ("queries", "db_time")
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+
+current_request_stats: ContextVar[Optional[RequestStats]] = ContextVar("current_request_stats", default=None)
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+# ✅ In-process metric store rendered in the Prometheus text format
+class Metrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = defaultdict(int)  # (method, route, status) -> count
+        self.latency = defaultdict(lambda: Histogram(LATENCY_BUCKETS))  # (method, route)
+        self.query_counts = defaultdict(lambda: Histogram(QUERY_COUNT_BUCKETS))  # (method, route)
+        self.db_time = defaultdict(float)  # (method, route) -> seconds
+        self.response_bytes = defaultdict(int)  # (method, route) -> bytes
+        self.n_plus_one = defaultdict(int)  # (method, route) -> flagged requests
+
+    def observe(self, method, route, status, seconds, stats: RequestStats, response_bytes):
+        key = (method, route)
+        with self._lock:
+            self.requests[(method, route, status)] += 1
+            self.latency[key].observe(seconds)
+            self.query_counts[key].observe(stats.queries)
+            self.db_time[key] += stats.db_time
+            self.response_bytes[key] += response_bytes
+            if stats.queries > QUERY_COUNT_THRESHOLD:
+                self.n_plus_one[key] += 1
+
+    def render(self) -> str:
+        lines = []
+
+        def labels(method, route, **extra):
+            pairs = [("method", method), ("route", route), *extra.items()]
+            return "{" + ",".join(f'{name}="{value}"' for name, value in pairs) + "}"
+
+        def histogram(name, help_text, values):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} histogram")
+            for (method, route), hist in sorted(values.items()):
+                cumulative = 0
+                for bound, count in zip((*hist.buckets, "+Inf"), hist.counts):
+                    cumulative += count
+                    lines.append(f"{name}_bucket{labels(method, route, le=bound)} {cumulative}")
+                lines.append(f"{name}_sum{labels(method, route)} {hist.sum}")
+                lines.append(f"{name}_count{labels(method, route)} {hist.count}")
+
+        def counter(name, help_text, values):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} counter")
+            for (method, route), value in sorted(values.items()):
+                lines.append(f"{name}{labels(method, route)} {value}")
+
+        with self._lock:
+            lines.append("# HELP http_requests_total Requests handled, by route and status")
+            lines.append("# TYPE http_requests_total counter")
+            for (method, route, status), value in sorted(self.requests.items()):
+                lines.append(f"http_requests_total{labels(method, route, status=status)} {value}")
+            histogram("http_request_duration_seconds", "Request latency", self.latency)
+            histogram("http_request_db_queries", "SQL statements issued per request", self.query_counts)
+            counter("http_request_db_seconds_total", "Time spent executing SQL", self.db_time)
+            counter("http_response_bytes_total", "Response body bytes sent", self.response_bytes)
+            counter("http_n_plus_one_requests_total", f"Requests issuing more than {QUERY_COUNT_THRESHOLD} SQL statements", self.n_plus_one)
+
+        pool = pool_stats.snapshot(get_engine().pool)
+        for name, key, kind in (
+            ("db_pool_checked_out", "checked_out", "gauge"),
+            ("db_pool_overflow", "overflow", "gauge"),
+            ("db_pool_checkouts_total", "checkouts", "counter"),
+            ("db_pool_checkout_failures_total", "checkout_failures", "counter"),
+        ):
+            lines.append(f"# TYPE {name} {kind}")
+            lines.append(f"{name} {pool[key]}")
+        return "\n".join(lines) + "\n"
+
+metrics = Metrics()
+
+# ✅ Count statements and DB time per request via engine events
+def instrument_engine(engine):
+    sync_engine = getattr(engine, "sync_engine", engine)
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_start"].pop()
+        stats = current_request_stats.get()
+        if stats is not None:
+            stats.queries += 1
+            stats.db_time += elapsed
+
+
+def start_profiler():
+    if PROFILE_SAMPLE_RATE <= 0 or random.random() >= PROFILE_SAMPLE_RATE:
+        return None
+    try:
+        from pyinstrument import Profiler
+    except ImportError:
+        logger.warning("PROFILE_SAMPLE_RATE is set but pyinstrument is not installed")
+        return None
+    profiler = Profiler(async_mode="enabled")
+    profiler.start()
+    return profiler
+
+def save_profile(profiler, method, route, elapsed_ms):
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    name = f"{int(time.time() * 1000)}-{method}-{route.strip('/').replace('/', '_') or 'root'}.html"
+    with open(os.path.join(PROFILE_DIR, name), "w") as f:
+        f.write(profiler.output_html())
+    logger.warning("slow request %s %s took %.0f ms, profile saved to %s", method, route, elapsed_ms, name)
+
+
+# ✅ ASGI middleware recording latency, SQL statements, DB time and response size per route
+class MetricsMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        stats = RequestStats()
+        token = current_request_stats.set(stats)
+        response = {"status": 500, "bytes": 0}
+        profiler = start_profiler()
+        start = time.perf_counter()
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                response["status"] = message["status"]
+            elif message["type"] == "http.response.body":
+                response["bytes"] += len(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            current_request_stats.reset(token)
+            route = getattr(scope.get("route"), "path", "unmatched")
+            method = scope["method"]
+            metrics.observe(method, route, response["status"], elapsed, stats, response["bytes"])
+            if stats.queries > QUERY_COUNT_THRESHOLD:
+                logger.warning("possible N+1: %s %s issued %d SQL statements", method, route, stats.queries)
+            if profiler is not None:
+                profiler.stop()
+                if elapsed * 1000 >= PROFILE_SLOW_MS:
+                    save_profile(profiler, method, route, elapsed * 1000)
+
+
+# ✅ Prometheus scrape endpoint
+@router.get("/metrics", include_in_schema=False)
+async def prometheus_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
@@ -1,4 +1,5 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, Date  # ✅ Add Date import
+from datetime import datetime
+from sqlalchemy import Column, Integer, String, ForeignKey, Date, DateTime, Index  # ✅ Add Date import
 from sqlalchemy.orm import relationship
 from database import Base
 from passlib.context import CryptContext  # ✅ Ensure passlib is imported properly
@@ -31,7 +32,12 @@ class Student(Base):
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, nullable=False)
     class_name = Column(String, nullable=False)
-    teacher_id = Column(Integer, ForeignKey("users.id"))
+    teacher_id = Column(Integer, ForeignKey("users.id"), index=True)
+
+    # Delta sync bookkeeping (same columns on Attendance and Assessment): when the row last changed
+    # and the change sequence of that write
+    updated_at = Column(DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
+    change_seq = Column(Integer, nullable=False, default=0, index=True)
 
     teacher = relationship("User", back_populates="students")
     assessments = relationship("Assessment", back_populates="student", cascade="all, delete-orphan")
@@ -40,6 +46,10 @@ class Student(Base):
 
 class Assessment(Base):
     __tablename__ = "assessments"
+    __table_args__ = (
+        Index("ix_assessments_student_exam_date", "student_id", "exam_date"),
+        Index("ix_assessments_subject_exam_date", "subject", "exam_date"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     student_id = Column(Integer, ForeignKey("students.id", ondelete="CASCADE"))
@@ -47,15 +57,70 @@ class Assessment(Base):
     score = Column(Integer, nullable=False)
     exam_date = Column(Date, nullable=False)
 
+    updated_at = Column(DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
+    change_seq = Column(Integer, nullable=False, default=0, index=True)
+
     student = relationship("Student", back_populates="assessments")
 
 
 class Attendance(Base):
     __tablename__ = "attendance"
+    __table_args__ = (
+        # One mark per student per day
+        Index("uq_attendance_student_date", "student_id", "date", unique=True),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     student_id = Column(Integer, ForeignKey("students.id", ondelete="CASCADE"))
     date = Column(Date, nullable=False)
     status = Column(String, nullable=False)  # "present" or "absent"
 
+    updated_at = Column(DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
+    change_seq = Column(Integer, nullable=False, default=0, index=True)
+
     student = relationship("Student", back_populates="attendance")
+
+
+class AttendanceMonthly(Base):
+    __tablename__ = "attendance_monthly"
+
+    # Per student per month counters, kept in step with attendance writes
+    student_id = Column(Integer, ForeignKey("students.id", ondelete="CASCADE"), primary_key=True)
+    month = Column(Date, primary_key=True)  # first day of the month
+    present_count = Column(Integer, nullable=False, default=0)
+    absent_count = Column(Integer, nullable=False, default=0)
+    # Bit d-1 stands for day d of the month: set in marked_bits when a mark exists, in present_bits when it is "present"
+    present_bits = Column(Integer, nullable=False, default=0)
+    marked_bits = Column(Integer, nullable=False, default=0)
+
+
+class DataVersion(Base):
+    __tablename__ = "data_versions"
+
+    # Change counter per data scope (e.g. "assessments"), bumped in the writing transaction
+    scope = Column(String, primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+
+
+class Tombstone(Base):
+    __tablename__ = "tombstones"
+
+    # Deleted rows, so sync clients learn about deletes; a deleted student's attendance and assessments go with it
+    id = Column(Integer, primary_key=True)
+    entity = Column(String, nullable=False)  # "students" or "assessments"
+    entity_id = Column(Integer, nullable=False)
+    # Owner of the deleted row, so pulls scoped to a teacher or class only get their own deletes
+    teacher_id = Column(Integer)
+    class_name = Column(String)
+    change_seq = Column(Integer, nullable=False, index=True)
+    deleted_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+
+class SyncOperation(Base):
+    __tablename__ = "sync_operations"
+
+    # Offline writes already applied, keyed by the client's own operation id, so retried pushes are no-ops
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    operation_id = Column(String, primary_key=True)
+    change_seq = Column(Integer, nullable=False)
+    applied_at = Column(DateTime, nullable=False, default=datetime.utcnow)
@@ -0,0 +1,42 @@
+import base64
+import json
+from datetime import date
+from fastapi import HTTPException
+from sqlalchemy import and_, or_
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+
+# ✅ Opaque cursor: the (date, id) of the last row on the previous page
+def encode_cursor(sort_value: date, row_id: int) -> str:
+    raw = json.dumps([sort_value.isoformat(), row_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode()
+
+def decode_cursor(cursor: str):
+    try:
+        sort_value, row_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return date.fromisoformat(sort_value), int(row_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+# ✅ Keyset pagination, newest first: WHERE (sort, id) < (cursor) ORDER BY sort DESC, id DESC LIMIT n
+# query selects plain columns (not entities); items come back as dicts ready for JSON encoding.
+async def paginate(db, query, sort_column, id_column, cursor: str, limit: int):
+    if cursor:
+        sort_value, last_id = decode_cursor(cursor)
+        # The redundant upper bound on sort alone lets Postgres prune date partitions and range-scan the index
+        query = query.filter(
+            sort_column <= sort_value,
+            or_(sort_column < sort_value, and_(sort_column == sort_value, id_column < last_id)),
+        )
+
+    # Fetch one extra row to know whether another page exists
+    rows = (await db.execute(query.order_by(sort_column.desc(), id_column.desc()).limit(limit + 1))).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor(getattr(last, sort_column.key), getattr(last, id_column.key))
+
+    return {"items": [row._asdict() for row in rows], "next_cursor": next_cursor}
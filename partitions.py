@@ -0,0 +1,167 @@
+import argparse
+import asyncio
+import csv
+import gzip
+import os
+import re
+from datetime import date
+from sqlalchemy import text
+from database import get_engine
+
+# Attendance is range-partitioned by academic year on Postgres (see migration 2948f681ca92).
+# Partition attendance_y2024 holds marks from ACADEMIC_YEAR_START_MONTH 2024 up to the same month in 2025.
+ACADEMIC_YEAR_START_MONTH = int(os.getenv("ACADEMIC_YEAR_START_MONTH", "8"))
+PARTITION_PATTERN = re.compile(r"^attendance_y(\d{4})$")
+# Archiving gives up rather than queue behind long readers for the brief lock the detach needs on attendance
+ARCHIVE_LOCK_TIMEOUT_MS = int(os.getenv("ARCHIVE_LOCK_TIMEOUT_MS", "5000"))
+
+def academic_year(day: date) -> int:
+    return day.year if day.month >= ACADEMIC_YEAR_START_MONTH else day.year - 1
+
+def academic_year_bounds(year: int):
+    return date(year, ACADEMIC_YEAR_START_MONTH, 1), date(year + 1, ACADEMIC_YEAR_START_MONTH, 1)
+
+def partition_name(year: int) -> str:
+    return f"attendance_y{year}"
+
+def create_partition_sql(year: int) -> str:
+    start, end = academic_year_bounds(year)
+    return (
+        f"CREATE TABLE IF NOT EXISTS {partition_name(year)} PARTITION OF attendance "
+        f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+    )
+
+def is_partitioned(conn) -> bool:
+    if conn.dialect.name != "postgresql":
+        return False
+    return bool(conn.execute(text(
+        "SELECT 1 FROM pg_partitioned_table WHERE partrelid = 'attendance'::regclass"
+    )).scalar())
+
+# Attached yearly partitions and their bounds, e.g. {2024: "FOR VALUES FROM ('2024-08-01') TO ('2025-08-01')"}
+def partition_bounds(conn) -> dict:
+    rows = conn.execute(text(
+        "SELECT child.relname, pg_get_expr(child.relpartbound, child.oid) FROM pg_inherits "
+        "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+        "WHERE pg_inherits.inhparent = 'attendance'::regclass"
+    )).all()
+    return {int(match.group(1)): bound for match, bound in ((PARTITION_PATTERN.match(name), bound) for name, bound in rows) if match}
+
+# Academic years that currently have an attached partition
+def attached_years(conn):
+    return sorted(partition_bounds(conn))
+
+# Existing partitions were cut with some start month; refuse to add ones that would overlap or leave gaps
+def check_start_month(bounds: dict):
+    for year, bound in bounds.items():
+        start, end = academic_year_bounds(year)
+        if f"'{start.isoformat()}'" not in bound or f"'{end.isoformat()}'" not in bound:
+            raise RuntimeError(
+                f"{partition_name(year)} is {bound}, which does not match "
+                f"ACADEMIC_YEAR_START_MONTH={ACADEMIC_YEAR_START_MONTH}"
+            )
+
+# Postgres rejects a new partition while the default partition holds rows in its range, so the default
+# partition is detached, the new partition created, the rows moved into it, and the default re-attached
+def create_partition(conn, year: int):
+    start, end = academic_year_bounds(year)
+    in_range = "date >= :start AND date < :end"
+    stray = conn.execute(text(f"SELECT EXISTS (SELECT 1 FROM attendance_default WHERE {in_range})"), {"start": start, "end": end}).scalar()
+    if not stray:
+        conn.execute(text(create_partition_sql(year)))
+        return
+    conn.execute(text("ALTER TABLE attendance DETACH PARTITION attendance_default"))
+    conn.execute(text(create_partition_sql(year)))
+    conn.execute(text(f"INSERT INTO attendance SELECT * FROM attendance_default WHERE {in_range}"), {"start": start, "end": end})
+    conn.execute(text(f"DELETE FROM attendance_default WHERE {in_range}"), {"start": start, "end": end})
+    conn.execute(text("ALTER TABLE attendance ATTACH PARTITION attendance_default DEFAULT"))
+
+# ✅ Make sure partitions exist from the current academic year through `ahead` years from now.
+# Runs at startup (see startup.py) and from `python partitions.py create`; an advisory lock keeps
+# instances starting together from racing.
+def ensure_partitions(conn, ahead: int = 1):
+    if not is_partitioned(conn):
+        return []
+    conn.execute(text("SELECT pg_advisory_xact_lock(hashtext('attendance_partitions'))"))
+    bounds = partition_bounds(conn)
+    check_start_month(bounds)
+    current = academic_year(date.today())
+    created = [year for year in range(current, current + ahead + 1) if year not in bounds]
+    for year in created:
+        create_partition(conn, year)
+    return created
+
+def export_partition(conn, table: str, directory: str) -> str:
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"{table}.csv.gz")
+    result = conn.execution_options(stream_results=True, yield_per=10000).execute(
+        text(f"SELECT id, student_id, date, status FROM {table} ORDER BY date, id")
+    )
+    with gzip.open(path, "wt", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(result.keys())
+        for rows in result.partitions():
+            writer.writerows(rows)
+    return path
+
+# Attached partitions of academic years before `before_year`
+def archivable_years(conn, before_year: int):
+    if not is_partitioned(conn):
+        raise SystemExit("attendance is not partitioned on this database")
+    return [year for year in attached_years(conn) if year < before_year]
+
+# DETACH takes ACCESS EXCLUSIVE on attendance until commit, so this transaction does nothing else slow
+def detach_partition(conn, table: str, mode: str):
+    conn.execute(text(f"SET LOCAL lock_timeout = {ARCHIVE_LOCK_TIMEOUT_MS}"))
+    conn.execute(text(f"ALTER TABLE attendance DETACH PARTITION {table}"))
+    if mode == "file":
+        conn.execute(text(f"DROP TABLE {table}"))
+    else:
+        conn.execute(text("CREATE SCHEMA IF NOT EXISTS attendance_archive"))
+        conn.execute(text(f"ALTER TABLE {table} SET SCHEMA attendance_archive"))
+
+# ✅ Archive partitions for academic years before `before_year`.
+# mode "file" writes each one to <directory>/<partition>.csv.gz and drops it;
+# mode "table" moves it to the attendance_archive schema as a cold table.
+# The export reads the still-attached partition in its own transaction (past years no longer change),
+# so attendance is only locked for the detach itself. Monthly counters in attendance_monthly are kept,
+# so analytics still cover archived years.
+async def archive_partitions(engine, before_year: int, mode: str, directory: str):
+    async with engine.connect() as conn:
+        years = await conn.run_sync(archivable_years, before_year)
+    archived = []
+    for year in years:
+        table = partition_name(year)
+        if mode == "file":
+            async with engine.connect() as conn:
+                archived.append(await conn.run_sync(export_partition, table, directory))
+        else:
+            archived.append(f"attendance_archive.{table}")
+        async with engine.begin() as conn:
+            await conn.run_sync(detach_partition, table, mode)
+    return archived
+
+async def main():
+    parser = argparse.ArgumentParser(description="Attendance partition maintenance (Postgres)")
+    commands = parser.add_subparsers(dest="command", required=True)
+    create = commands.add_parser("create", help="create partitions for the current and upcoming academic years")
+    create.add_argument("--ahead", type=int, default=1)
+    archive = commands.add_parser("archive", help="detach and archive partitions of past academic years")
+    archive.add_argument("--before", type=int, required=True, help="archive academic years starting before this year")
+    archive.add_argument("--mode", choices=["file", "table"], default="file")
+    archive.add_argument("--dir", default="attendance_archive")
+    args = parser.parse_args()
+
+    engine = get_engine()
+    if args.command == "create":
+        async with engine.begin() as conn:
+            created = await conn.run_sync(ensure_partitions, args.ahead)
+        print("created: " + (", ".join(map(partition_name, created)) or "nothing"))
+    else:
+        archived = await archive_partitions(engine, args.before, args.mode, args.dir)
+        print("archived: " + (", ".join(archived) or "nothing"))
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,135 @@
+import abc
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional
+from fastapi import HTTPException, Request, status
+
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "true").lower() == "true"
+# Use the first X-Forwarded-For address as the client IP (only behind a proxy that sets it)
+RATE_LIMIT_TRUST_PROXY = os.getenv("RATE_LIMIT_TRUST_PROXY", "false").lower() == "true"
+# Buckets tracked by the in-memory backend; the least recently used are dropped beyond this
+RATE_LIMIT_MAX_KEYS = int(os.getenv("RATE_LIMIT_MAX_KEYS", "100000"))
+# Auth requests (login + signup) admitted at once per process; the rest get a 429 straight away
+AUTH_MAX_CONCURRENT = int(os.getenv("AUTH_MAX_CONCURRENT", str(4 * (os.cpu_count() or 2))))
+
+
+@dataclass(frozen=True)
+class BucketLimit:
+    burst: int  # bucket capacity
+    per_minute: float  # refill rate
+
+    @classmethod
+    def from_env(cls, name: str, burst: int, per_minute: float):
+        return cls(
+            int(os.getenv(f"{name}_BURST", str(burst))),
+            float(os.getenv(f"{name}_PER_MINUTE", str(per_minute))),
+        )
+
+# Per-IP buckets are sized for a whole school behind one NAT address (hundreds of teachers logging in
+# at 9 a.m.); the per-account buckets and the concurrency cap are what stop guessing and floods
+LOGIN_IP_LIMIT = BucketLimit.from_env("LOGIN_IP", 600, 300)
+LOGIN_ACCOUNT_LIMIT = BucketLimit.from_env("LOGIN_ACCOUNT", 5, 5)
+SIGNUP_IP_LIMIT = BucketLimit.from_env("SIGNUP_IP", 100, 30)
+SIGNUP_ACCOUNT_LIMIT = BucketLimit.from_env("SIGNUP_ACCOUNT", 3, 1)
+
+
+# ✅ Token bucket storage interface. A shared store (e.g. Redis with a Lua script) can replace the
+# in-memory backend by implementing take() and being assigned to auth_limiter.backend.
+class TokenBucketBackend(abc.ABC):
+    @abc.abstractmethod
+    async def take(self, key: str, limit: BucketLimit) -> float:
+        """Take one token from the bucket; returns 0 if granted, otherwise seconds until a token is available."""
+
+
+# Per-process buckets: (tokens, last refill time) per key, refilled lazily on access
+class InMemoryTokenBuckets(TokenBucketBackend):
+    def __init__(self, max_keys: int):
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    async def take(self, key: str, limit: BucketLimit) -> float:
+        now = time.monotonic()
+        rate = limit.per_minute / 60
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (limit.burst, now))
+            tokens = min(limit.burst, tokens + (now - updated) * rate)
+            wait = 0.0
+            if tokens >= 1:
+                tokens -= 1
+            else:
+                wait = (1 - tokens) / rate if rate else math.inf
+            self._buckets[key] = (tokens, now)
+            self._buckets.move_to_end(key)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        return wait
+
+
+def client_ip(request: Request) -> str:
+    if RATE_LIMIT_TRUST_PROXY:
+        forwarded = request.headers.get("x-forwarded-for")
+        if forwarded:
+            return forwarded.split(",")[0].strip()
+    return request.client.host if request.client else "unknown"
+
+def too_many_requests(retry_after: float) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        detail="Too many requests, please retry later",
+        headers={"Retry-After": str(max(1, math.ceil(min(retry_after, 3600))))},
+    )
+
+
+# ✅ Admission control for the auth routes: per-IP and per-account buckets plus a concurrency cap.
+# Runs as a dependency, so rejected requests never reach the database or bcrypt.
+class AuthLimiter:
+    def __init__(self, backend: TokenBucketBackend, max_concurrent: int):
+        self.backend = backend
+        self.max_concurrent = max_concurrent
+        self._active = 0
+        self._lock = threading.Lock()
+
+    async def check(self, scope: str, ip: str, account: Optional[str], ip_limit: BucketLimit, account_limit: BucketLimit):
+        wait = await self.backend.take(f"{scope}:ip:{ip}", ip_limit)
+        if not wait and account:
+            wait = await self.backend.take(f"{scope}:account:{account}", account_limit)
+        if wait:
+            raise too_many_requests(wait)
+
+    def acquire(self):
+        with self._lock:
+            if self._active >= self.max_concurrent:
+                raise too_many_requests(1)
+            self._active += 1
+
+    def release(self):
+        with self._lock:
+            self._active -= 1
+
+auth_limiter = AuthLimiter(InMemoryTokenBuckets(RATE_LIMIT_MAX_KEYS), AUTH_MAX_CONCURRENT)
+
+# The account is read from the already-parsed request body (Starlette caches it), before any lookup
+def rate_limit_auth(scope: str, account_field: str, ip_limit: BucketLimit, account_limit: BucketLimit):
+    async def limiter(request: Request):
+        if not RATE_LIMIT_ENABLED:
+            yield
+            return
+        if request.headers.get("content-type", "").startswith("application/json"):
+            body = await request.json()
+        else:
+            body = await request.form()
+        account = body.get(account_field) if hasattr(body, "get") else None
+        account = account.strip().lower() if isinstance(account, str) else None
+
+        await auth_limiter.check(scope, client_ip(request), account, ip_limit, account_limit)
+        auth_limiter.acquire()
+        try:
+            yield
+        finally:
+            auth_limiter.release()
+    return limiter
@@ -0,0 +1,194 @@
+import asyncio
+import contextvars
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from fastapi import HTTPException, Request, status
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from database import SessionLocal, async_database_url, engine_options
+from versions import SYNC_SCOPE, get_version
+
+logger = logging.getLogger(__name__)
+
+# Optional read replica for the list endpoints; unset means every read goes to the primary
+REPLICA_DATABASE_URL = os.getenv("REPLICA_DATABASE_URL")
+# Reads fall back when the replica is this far behind the primary
+REPLICA_MAX_LAG_SECONDS = float(os.getenv("REPLICA_MAX_LAG_SECONDS", "5"))
+# How often replica health and lag are re-checked (in the background, started by whichever read comes first)
+REPLICA_CHECK_INTERVAL = float(os.getenv("REPLICA_CHECK_INTERVAL", "1"))
+# A check that hasn't finished after this long marks the replica down (a host that stops answering)
+REPLICA_CHECK_TIMEOUT = float(os.getenv("REPLICA_CHECK_TIMEOUT", "2"))
+# "primary": serve from the primary while the replica is down or lagging; "error": answer 503 instead
+REPLICA_FALLBACK = os.getenv("REPLICA_FALLBACK", "primary")
+# Clients whose latest write the replica may not have yet; the oldest are forgotten beyond this
+REPLICA_MAX_TRACKED_WRITERS = int(os.getenv("REPLICA_MAX_TRACKED_WRITERS", "10000"))
+
+
+# ✅ Routes read-only sessions to the replica while it is reachable and close enough to the primary.
+# Lag is measured with the global change sequence from data_versions, so it works on any backend
+# (including two SQLite files): the replica is as far behind as the oldest primary sequence it hasn't seen.
+class ReplicaRouter:
+    def __init__(self, primary_factory, replica_factory, max_lag: float, check_interval: float, check_timeout: float, fallback: str, max_writers: int):
+        self.primary_factory = primary_factory
+        self.replica_factory = replica_factory
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self.check_timeout = check_timeout
+        self.fallback = fallback
+        self.max_writers = max_writers
+        self.usable = False
+        self.lag = None
+        self.error = None
+        self.replica_seq = None  # replica's change sequence at the last check
+        self._checked_at = float("-inf")
+        self._samples = deque()  # (time observed, primary sequence)
+        self._task = None  # background check in flight, if any
+        self._writers = OrderedDict()  # credentials -> primary change sequence after their last write
+        self._writers_lock = threading.Lock()
+
+    # Read-your-writes: a client that wrote is kept on the primary until the replica has replayed
+    # everything up to the primary's change sequence right after that write
+    async def record_write(self, credentials: str):
+        async with self.primary_factory() as db:
+            seq = await get_version(db, SYNC_SCOPE)
+        with self._writers_lock:
+            self._writers[credentials] = seq
+            self._writers.move_to_end(credentials)
+            while len(self._writers) > self.max_writers:
+                self._writers.popitem(last=False)
+
+    def needs_primary(self, credentials: str) -> bool:
+        with self._writers_lock:
+            seq = self._writers.get(credentials)
+            if seq is None:
+                return False
+            if self.replica_seq is not None and self.replica_seq >= seq:
+                del self._writers[credentials]
+                return False
+            return True
+
+    def mark_down(self, error):
+        self.usable = False
+        self.error = str(error)
+        self._checked_at = time.monotonic()
+
+    async def check(self):
+        now = time.monotonic()
+        try:
+            async with self.primary_factory() as db:
+                primary_seq = await get_version(db, SYNC_SCOPE)
+            async with self.replica_factory() as db:
+                replica_seq = await get_version(db, SYNC_SCOPE)
+        except (DBAPIError, OSError) as exc:
+            logger.warning("read replica unavailable: %s", exc)
+            self.mark_down(exc)
+            return
+
+        self.replica_seq = replica_seq
+        self._samples.append((now, primary_seq))
+        while self._samples and self._samples[0][1] <= replica_seq:
+            self._samples.popleft()
+        self.lag = now - self._samples[0][0] if self._samples else 0.0
+        self.usable = self.lag <= self.max_lag
+        self.error = None if self.usable else f"replica is {self.lag:.1f}s behind"
+        self._checked_at = now
+
+    async def refresh(self):
+        try:
+            await asyncio.wait_for(self.check(), self.check_timeout)
+        except asyncio.TimeoutError:
+            logger.warning("read replica check timed out after %.1fs", self.check_timeout)
+            self.mark_down(f"replica check timed out after {self.check_timeout:.1f}s")
+
+    # Reads never wait on a check: a due check runs in the background and reads use the last known state
+    def schedule_check(self):
+        if time.monotonic() - self._checked_at < self.check_interval:
+            return
+        loop = asyncio.get_running_loop()
+        if self._task is not None and not self._task.done() and self._task.get_loop() is loop:
+            return
+        # Started from an empty context so the check's SQL isn't billed to the request that triggered it
+        self._task = contextvars.Context().run(loop.create_task, self.refresh())
+
+    async def session_factory(self, request: Request):
+        self.schedule_check()
+
+        credentials = request.headers.get("authorization")
+        if credentials and self.needs_primary(credentials):
+            return self.primary_factory
+
+        if self.usable:
+            return self.replica_factory
+        if self.fallback == "error":
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Read replica unavailable",
+                headers={"Retry-After": str(max(1, int(self.check_interval)))},
+            )
+        return self.primary_factory
+
+    def status(self) -> dict:
+        return {"usable": self.usable, "lag_seconds": None if self.lag is None else round(self.lag, 3), "error": self.error}
+
+
+# Replica engine and router: created by create_app (from Settings), not at import time
+replica_engine = None
+replica_router = None
+
+def configure_replica(url: str = None):
+    global replica_engine, replica_router
+    replica_engine, replica_router = None, None
+    if url:
+        replica_url = async_database_url(url)
+        # Plain queue pool: pool_stats and /metrics describe the primary pool
+        replica_engine = create_async_engine(replica_url, **{**engine_options(replica_url), "poolclass": AsyncAdaptedQueuePool})
+        ReplicaSessionLocal = async_sessionmaker(bind=replica_engine, autoflush=False, expire_on_commit=False)
+        replica_router = ReplicaRouter(SessionLocal, ReplicaSessionLocal, REPLICA_MAX_LAG_SECONDS, REPLICA_CHECK_INTERVAL, REPLICA_CHECK_TIMEOUT, REPLICA_FALLBACK, REPLICA_MAX_TRACKED_WRITERS)
+    return replica_engine
+
+def get_replica_engine():
+    return replica_engine
+
+def get_replica_router():
+    return replica_router
+
+# ✅ Dependency for read-only routes: a replica session when one is configured and healthy, else the primary.
+# Never write through this session.
+async def get_read_db(request: Request):
+    if replica_router is None:
+        async with SessionLocal() as db:
+            yield db
+        return
+
+    factory = await replica_router.session_factory(request)
+    async with factory() as db:
+        try:
+            yield db
+        except DBAPIError as exc:
+            if factory is replica_router.replica_factory:
+                replica_router.mark_down(exc)
+            raise
+
+
+# ✅ ASGI middleware remembering which credentials just wrote, so their next reads stay on the primary
+class ReadYourWritesMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if replica_router is None or scope["type"] != "http" or scope["method"] in ("GET", "HEAD", "OPTIONS"):
+            return await self.app(scope, receive, send)
+
+        credentials = dict(scope["headers"]).get(b"authorization")
+
+        async def send_wrapper(message):
+            # Recorded before the response goes out, so the client's next read already sees it
+            if credentials and message["type"] == "http.response.start" and message["status"] < 400:
+                await replica_router.record_write(credentials.decode("latin-1"))
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
@@ -0,0 +1,8 @@
+import orjson
+from fastapi.responses import JSONResponse
+
+# ✅ JSON response encoded with orjson (dates, datetimes and numpy values are handled natively).
+# Routes that return one of these directly skip FastAPI's jsonable_encoder pass entirely.
+class ORJSONResponse(JSONResponse):
+    def render(self, content) -> bytes:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
@@ -1,17 +1,25 @@
+from datetime import date, timedelta
+from itertools import groupby
+from typing import Dict, List, Optional
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from pydantic import BaseModel
-from database import get_db
-from models import User
-from auth import get_password_hash, verify_password, create_access_token, get_current_user, oauth2_scheme, decode_access_token
+from database import get_db, get_engine, pool_stats
+from replicas import get_replica_router
+from models import Assessment, AttendanceMonthly, Student, User
+from responses import ORJSONResponse
+from analytics import attendance_timeline, month_start, timeline_summary
+from auth import Principal, create_access_token, get_current_user, get_user_by_email, password_hasher, oauth2_scheme, decode_access_token
 from fastapi.security import OAuth2PasswordRequestForm, OAuth2PasswordBearer
+from ratelimit import LOGIN_ACCOUNT_LIMIT, LOGIN_IP_LIMIT, SIGNUP_ACCOUNT_LIMIT, SIGNUP_IP_LIMIT, rate_limit_auth
 from pydantic import BaseModel, EmailStr
 
 router = APIRouter()
 
 # Function to check role-based access
 def require_role(allowed_roles: list):
-    def role_checker(current_user: User = Depends(get_current_user)):
+    async def role_checker(current_user: Principal = Depends(get_current_user)):
         if current_user.role not in allowed_roles:
             raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Access denied")
         return current_user
@@ -32,41 +40,130 @@ class SignupRequest(BaseModel):
     role: str
 
 # ✅ Signup Route
-@router.post("/signup", status_code=status.HTTP_201_CREATED)
-def signup(user: SignupRequest, db: Session = Depends(get_db)):
-    existing_user = db.query(User).filter(User.email == user.email).first()
+@router.post(
+    "/signup",
+    status_code=status.HTTP_201_CREATED,
+    dependencies=[Depends(rate_limit_auth("signup", "email", SIGNUP_IP_LIMIT, SIGNUP_ACCOUNT_LIMIT))],
+)
+async def signup(user: SignupRequest, db: AsyncSession = Depends(get_db)):
+    existing_user = await get_user_by_email(db, user.email)
     if existing_user:
         raise HTTPException(status_code=400, detail="Email already registered")
     
-    hashed_password = get_password_hash(user.password)
+    hashed_password = await password_hasher.hash(user.password)
     new_user = User(name=user.name, email=user.email, hashed_password=hashed_password, role=user.role)
     
     db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+    await db.commit()
+    await db.refresh(new_user)
     
     return {"message": "User created successfully! Please log in.", "user_id": new_user.id}
 # ✅ Login Route: Generates JWT Token
-@router.post("/token")
-def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.email == form_data.username).first()
-    if not user or not verify_password(form_data.password, user.hashed_password):
+@router.post("/token", dependencies=[Depends(rate_limit_auth("login", "username", LOGIN_IP_LIMIT, LOGIN_ACCOUNT_LIMIT))])
+async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_db)):
+    user = await get_user_by_email(db, form_data.username)
+    if not user:
         raise HTTPException(status_code=401, detail="Invalid email or password")
+
+    valid, new_hash = await password_hasher.verify_and_update(form_data.password, user.hashed_password)
+    if not valid:
+        raise HTTPException(status_code=401, detail="Invalid email or password")
+
+    # Transparently upgrade hashes made with an old bcrypt cost
+    if new_hash:
+        user.hashed_password = new_hash
+        await db.commit()
     
-    access_token = create_access_token(data={"sub": user.email, "role": user.role})
+    access_token = create_access_token(data={"sub": user.email, "uid": user.id, "name": user.name, "role": user.role})
     return {"access_token": access_token, "token_type": "bearer"}
 
 # ✅ Protected Route Example (Only accessible with JWT)
 @router.get("/protected")
-def protected_route(current_user: User = Depends(get_current_user)):
+async def protected_route(current_user: Principal = Depends(get_current_user)):
     return {"message": f"Welcome {current_user.name}, you are authorized!"}
 
+DASHBOARD_RATE_DAYS = 30
+
+# ✅ Response Models for the Teacher Dashboard
+class LatestScore(BaseModel):
+    score: int
+    exam_date: date
+
+class DashboardStudent(BaseModel):
+    id: int
+    name: str
+    class_name: str
+    today_status: Optional[str] = None
+    attendance_rate_30d: Optional[float] = None
+    latest_scores: Dict[str, LatestScore] = {}
+
+class TeacherDashboard(BaseModel):
+    date: date
+    students: List[DashboardStudent]
+
 # ✅ Teacher Dashboard (For Teachers & Admins)
-@router.get("/teacher/dashboard")
-def teacher_dashboard(current_user: User = Depends(require_role(["teacher", "admin"]))):
-    return {"message": "Welcome Teacher! You can manage students."}
+# Three queries however large the roster: students, one read of the attendance bitsets, one latest-score window query.
+@router.get("/teacher/dashboard", response_model=TeacherDashboard, response_class=ORJSONResponse)
+async def teacher_dashboard(db: AsyncSession = Depends(get_db), current_user: Principal = Depends(require_role(["teacher", "admin"]))):
+    today = date.today()
+    roster = select(Student.id).filter(Student.teacher_id == current_user.id)
+
+    students = {
+        row.id: {**row._asdict(), "today_status": None, "attendance_rate_30d": None, "latest_scores": {}}
+        for row in await db.execute(
+            select(Student.id, Student.name, Student.class_name)
+            .filter(Student.teacher_id == current_user.id)
+            .order_by(Student.class_name, Student.name)
+        )
+    }
+
+    # Today's mark and the 30-day rate come from the monthly bitsets: at most two rows per student
+    first_day = today - timedelta(days=DASHBOARD_RATE_DAYS - 1)
+    bitsets = await db.execute(
+        select(AttendanceMonthly.student_id, AttendanceMonthly.month, AttendanceMonthly.present_bits, AttendanceMonthly.marked_bits)
+        .filter(
+            AttendanceMonthly.student_id.in_(roster),
+            AttendanceMonthly.month >= month_start(first_day),
+            AttendanceMonthly.month <= month_start(today),
+        )
+        .order_by(AttendanceMonthly.student_id)
+    )
+    for student_id, rows in groupby(bitsets, key=lambda row: row.student_id):
+        present, marked = attendance_timeline((row[1:] for row in rows), first_day, today)
+        today_bit = 1 << (DASHBOARD_RATE_DAYS - 1)
+        if marked & today_bit:
+            students[student_id]["today_status"] = "present" if present & today_bit else "absent"
+        students[student_id]["attendance_rate_30d"] = timeline_summary(present, marked)["rate"]
+
+    ranked = (
+        select(
+            Assessment.student_id,
+            Assessment.subject,
+            Assessment.score,
+            Assessment.exam_date,
+            func.row_number().over(
+                partition_by=(Assessment.student_id, Assessment.subject),
+                order_by=(Assessment.exam_date.desc(), Assessment.id.desc()),
+            ).label("rank"),
+        )
+        .filter(Assessment.student_id.in_(roster))
+        .subquery()
+    )
+    latest = await db.execute(
+        select(ranked.c.student_id, ranked.c.subject, ranked.c.score, ranked.c.exam_date).filter(ranked.c.rank == 1)
+    )
+    for student_id, subject, score, exam_date in latest:
+        students[student_id]["latest_scores"][subject] = {"score": score, "exam_date": exam_date}
+
+    return ORJSONResponse({"date": today, "students": list(students.values())})
 
 # ✅ Admin Dashboard (For Admins Only)
 @router.get("/admin/dashboard")
-def admin_dashboard(current_user: User = Depends(require_role(["admin"]))):
+async def admin_dashboard(current_user: Principal = Depends(require_role(["admin"]))):
     return {"message": "Welcome Admin! You have full access."}
+
+# ✅ Connection Pool Stats and Read Replica Health (For Admins Only)
+@router.get("/admin/db/pool")
+async def pool_status(current_user: Principal = Depends(require_role(["admin"]))):
+    replica_router = get_replica_router()
+    return {**pool_stats.snapshot(get_engine().pool), "replica": replica_router.status() if replica_router else None}
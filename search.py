@@ -0,0 +1,227 @@
+import heapq
+import os
+import re
+from bisect import bisect_left, insort
+from collections import Counter
+from dataclasses import dataclass
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy import Float, case, cast, func, literal, or_, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from replicas import get_read_db
+from models import Student, Tombstone
+from auth import Principal, get_current_user
+from responses import ORJSONResponse
+from versions import SYNC_SCOPE, get_version
+
+router = APIRouter()
+
+DEFAULT_SEARCH_LIMIT = 20
+MAX_SEARCH_LIMIT = 100
+MAX_SEARCH_OFFSET = 1000
+# Minimum trigram word similarity (0-1) for a typo-tolerant match; prefix matches always qualify
+STUDENT_SEARCH_MIN_SIMILARITY = float(os.getenv("STUDENT_SEARCH_MIN_SIMILARITY", "0.3"))
+
+def normalize(value: str) -> str:
+    return " ".join(value.lower().split())
+
+def escape_like(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+# Trigrams the way pg_trgm builds them: per alphanumeric word, padded with two spaces in front and one behind
+def trigrams(value: str) -> set:
+    grams = set()
+    for word in re.split(r"[\W_]+", value):
+        if word:
+            padded = f"  {word} "
+            grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+def similarity(a: set, b: set) -> float:
+    return len(a & b) / len(a | b) if a and b else 0.0
+
+
+# ✅ Postgres: prefix LIKE and pg_trgm's word similarity, both served by the GIN trigram indexes on lower(name/class_name)
+async def search_postgres(db, q: str, teacher_id: Optional[int], class_name: Optional[str], limit: int, offset: int):
+    name, klass = func.lower(Student.name), func.lower(Student.class_name)
+    pattern = escape_like(q) + "%"
+    prefix = or_(name.like(pattern, escape="\\"), name.like("% " + pattern, escape="\\"), klass.like(pattern, escape="\\"))
+    score = func.greatest(func.word_similarity(q, name), func.word_similarity(q, klass))
+
+    # `<%` only uses the index with its own threshold, so set it for this transaction
+    await db.execute(text("SELECT set_config('pg_trgm.word_similarity_threshold', :threshold, true)"), {"threshold": str(STUDENT_SEARCH_MIN_SIMILARITY)})
+    query = (
+        select(Student.id, Student.name, Student.class_name, Student.teacher_id, cast(case((prefix, 1.0), else_=score), Float).label("score"))
+        .filter(or_(prefix, literal(q).op("<%")(name), literal(q).op("<%")(klass)))
+    )
+    if teacher_id is not None:
+        query = query.filter(Student.teacher_id == teacher_id)
+    if class_name:
+        query = query.filter(Student.class_name == class_name)
+    rows = await db.execute(
+        query.order_by(case((prefix, 0), else_=1), score.desc(), Student.name, Student.id).offset(offset).limit(limit)
+    )
+    return [{**row._asdict(), "score": round(row.score, 3)} for row in rows]
+
+
+@dataclass
+class SearchEntry:
+    id: int
+    name: str
+    class_name: str
+    teacher_id: Optional[int]
+    change_seq: int
+    normalized_name: str
+    normalized_class: str
+    words: tuple  # normalized name words plus the whole class name, for prefix lookups
+    grams: set
+
+    @classmethod
+    def from_row(cls, row):
+        normalized_name, normalized_class = normalize(row.name), normalize(row.class_name)
+        words = (*normalized_name.split(), normalized_class)
+        return cls(row.id, row.name, row.class_name, row.teacher_id, row.change_seq, normalized_name, normalized_class, words, trigrams(" ".join(words)))
+
+    def is_prefix_match(self, q: str) -> bool:
+        return self.normalized_name.startswith(q) or f" {q}" in self.normalized_name or self.normalized_class.startswith(q)
+
+    # Approximates pg_trgm's word_similarity: the best match of q against as many consecutive words as q has
+    def word_similarity(self, q: str, q_grams: set) -> float:
+        name_words = self.normalized_name.split()
+        width = len(q.split())
+        windows = [" ".join(name_words[i:i + width]) for i in range(max(1, len(name_words) - width + 1))]
+        return max(similarity(q_grams, trigrams(window)) for window in [*windows, self.normalized_class])
+
+
+# ✅ In-process search index for SQLite: a sorted word list for prefixes and a trigram -> students map for typos.
+# Kept current through the global change sequence: each search first applies students and tombstones
+# written since the sequence the index was last refreshed at.
+class StudentSearchIndex:
+    def __init__(self):
+        self.entries = {}
+        self.words = []  # sorted (word, student id)
+        self.grams = {}  # trigram -> set of student ids
+        self.seq = None  # change sequence the index reflects; None until first built
+
+    def rebuild(self, entries):
+        self.entries = {entry.id: entry for entry in entries}
+        self.words = sorted((word, entry.id) for entry in self.entries.values() for word in set(entry.words))
+        self.grams = {}
+        for entry in self.entries.values():
+            for gram in entry.grams:
+                self.grams.setdefault(gram, set()).add(entry.id)
+
+    def add(self, entry: SearchEntry):
+        current = self.entries.get(entry.id)
+        if current is not None:
+            if current.change_seq > entry.change_seq:
+                return
+            self.remove(entry.id)
+        self.entries[entry.id] = entry
+        for word in set(entry.words):
+            insort(self.words, (word, entry.id))
+        for gram in entry.grams:
+            self.grams.setdefault(gram, set()).add(entry.id)
+
+    def remove(self, student_id: int):
+        entry = self.entries.pop(student_id, None)
+        if entry is None:
+            return
+        for word in set(entry.words):
+            index = bisect_left(self.words, (word, student_id))
+            if index < len(self.words) and self.words[index] == (word, student_id):
+                del self.words[index]
+        for gram in entry.grams:
+            ids = self.grams.get(gram)
+            if ids is not None:
+                ids.discard(student_id)
+                if not ids:
+                    del self.grams[gram]
+
+    async def refresh(self, db: AsyncSession):
+        seq = await get_version(db, SYNC_SCOPE)
+        if self.seq is not None and seq <= self.seq:
+            return
+        since = self.seq
+        query = select(Student.id, Student.name, Student.class_name, Student.teacher_id, Student.change_seq)
+        deleted = []
+        if since is not None:
+            query = query.filter(Student.change_seq > since)
+            deleted = (await db.scalars(
+                select(Tombstone.entity_id).filter(Tombstone.entity == "students", Tombstone.change_seq > since)
+            )).all()
+        rows = (await db.execute(query)).all()
+
+        # Another search may have refreshed further while this one was reading
+        if self.seq is not None and seq <= self.seq:
+            return
+        if since is None:
+            self.rebuild(SearchEntry.from_row(row) for row in rows)
+        else:
+            for student_id in deleted:
+                self.remove(student_id)
+            for row in rows:
+                self.add(SearchEntry.from_row(row))
+        self.seq = seq
+
+    def search(self, q: str, teacher_id: Optional[int], class_name: Optional[str], limit: int, offset: int):
+        first_word = q.split()[0]
+        candidates = set()
+        index = bisect_left(self.words, (first_word,))
+        while index < len(self.words) and self.words[index][0].startswith(first_word):
+            candidates.add(self.words[index][1])
+            index += 1
+
+        # Only students sharing enough trigrams with q can reach the similarity threshold
+        q_grams = trigrams(q)
+        shared = Counter(student_id for gram in q_grams for student_id in self.grams.get(gram, ()))
+        candidates.update(student_id for student_id, count in shared.items() if count >= STUDENT_SEARCH_MIN_SIMILARITY * len(q_grams))
+
+        matches = []
+        for student_id in candidates:
+            entry = self.entries[student_id]
+            if (teacher_id is not None and entry.teacher_id != teacher_id) or (class_name and entry.class_name != class_name):
+                continue
+            if entry.is_prefix_match(q):
+                matches.append((0, 1.0, entry))
+                continue
+            score = entry.word_similarity(q, q_grams)
+            if score >= STUDENT_SEARCH_MIN_SIMILARITY:
+                matches.append((1, score, entry))
+
+        ranked = heapq.nsmallest(offset + limit, matches, key=lambda match: (match[0], -match[1], match[2].name, match[2].id))
+        return [
+            {"id": entry.id, "name": entry.name, "class_name": entry.class_name, "teacher_id": entry.teacher_id, "score": round(score, 3)}
+            for _, score, entry in ranked[offset:]
+        ]
+
+student_search_index = StudentSearchIndex()
+
+
+# ✅ Search Students by Name or Class (Only for Teachers/Admins)
+# Prefix matches rank first, then typo-tolerant matches by similarity. Teachers search their own students, admins all.
+@router.get("/students/search", response_class=ORJSONResponse)
+async def search_students(
+    q: str = Query(..., min_length=1, max_length=100),
+    class_name: Optional[str] = None,
+    limit: int = Query(DEFAULT_SEARCH_LIMIT, ge=1, le=MAX_SEARCH_LIMIT),
+    offset: int = Query(0, ge=0, le=MAX_SEARCH_OFFSET),
+    db: AsyncSession = Depends(get_read_db),
+    current_user: Principal = Depends(get_current_user),
+):
+    if current_user.role not in ["teacher", "admin"]:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Only teachers and admins can search students")
+
+    query = normalize(q)
+    if not query:
+        raise HTTPException(status_code=400, detail="Search query must not be blank")
+    teacher_id = None if current_user.role == "admin" else current_user.id
+
+    # One extra row tells whether another page exists
+    if db.bind.dialect.name == "postgresql":
+        items = await search_postgres(db, query, teacher_id, class_name, limit + 1, offset)
+    else:
+        await student_search_index.refresh(db)
+        items = student_search_index.search(query, teacher_id, class_name, limit + 1, offset)
+
+    return {"items": items[:limit], "next_offset": offset + limit if len(items) > limit else None}
@@ -0,0 +1,210 @@
+import argparse
+import asyncio
+import logging
+import os
+import subprocess
+import sys
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import List, Optional
+from fastapi import APIRouter, Request
+from sqlalchemy import text
+from auth import create_access_token, decode_access_token, password_hasher
+from database import DB_POOL_SIZE, get_engine
+from partitions import ensure_partitions
+from replicas import REPLICA_DATABASE_URL, get_replica_engine, get_replica_router
+from responses import ORJSONResponse
+
+logger = logging.getLogger(__name__)
+
+# Connections opened (and returned to the pool) before the app reports ready
+WARMUP_CONNECTIONS = int(os.getenv("WARMUP_CONNECTIONS", str(DB_POOL_SIZE)))
+# Run one bcrypt hash and one JWT round trip at startup, so the first login doesn't pay for it
+WARMUP_AUTH = os.getenv("WARMUP_AUTH", "true").lower() == "true"
+# "warn": log a schema that isn't at the Alembic head; "strict": refuse to start; "off": skip the check
+SCHEMA_CHECK = os.getenv("SCHEMA_CHECK", "warn")
+# Attendance partitions (Postgres) created at startup: the current academic year plus this many ahead
+PARTITIONS_AHEAD = int(os.getenv("PARTITIONS_AHEAD", "1"))
+# /readyz gives up on the database ping after this long
+READINESS_DB_TIMEOUT = float(os.getenv("READINESS_DB_TIMEOUT", "2"))
+ALEMBIC_INI = os.path.join(os.path.dirname(os.path.abspath(__file__)), "alembic.ini")
+
+
+@dataclass
+class Settings:
+    database_url: Optional[str] = None  # defaults to DATABASE_URL
+    replica_database_url: Optional[str] = REPLICA_DATABASE_URL  # None sends every read to the primary
+    warmup_connections: int = WARMUP_CONNECTIONS
+    warmup_auth: bool = WARMUP_AUTH
+    schema_check: str = SCHEMA_CHECK
+    partitions_ahead: Optional[int] = PARTITIONS_AHEAD  # None skips partition maintenance
+    cors_origins: List[str] = field(default_factory=lambda: ["*"])  # Or specify your frontend URL for tighter security
+
+
+# Open connections concurrently and hand them back, so the pool starts full
+async def warm_pool(engine, connections: int):
+    async def open_one():
+        async with engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+    await asyncio.gather(*(open_one() for _ in range(connections)))
+
+# Load the bcrypt backend and start the hashing threads, and exercise jose's encode/decode path
+async def warm_auth():
+    await password_hasher.hash("warmup")
+    decode_access_token(create_access_token({"sub": "warmup"}))
+
+# Alembic is only imported when the check runs
+def schema_heads(sync_conn):
+    from alembic.config import Config
+    from alembic.runtime.migration import MigrationContext
+    from alembic.script import ScriptDirectory
+    config = Config(ALEMBIC_INI)
+    config.set_main_option("script_location", os.path.join(os.path.dirname(ALEMBIC_INI), "alembic"))
+    expected = set(ScriptDirectory.from_config(config).get_heads())
+    current = set(MigrationContext.configure(sync_conn).get_current_heads())
+    return current, expected
+
+async def check_schema(engine, mode: str) -> dict:
+    async with engine.connect() as conn:
+        current, expected = await conn.run_sync(schema_heads)
+    result = {"current": sorted(current), "expected": sorted(expected), "ok": current == expected}
+    if not result["ok"]:
+        message = f"database schema is at {result['current'] or 'no revision'}, expected Alembic head {result['expected']}"
+        if mode == "strict":
+            raise RuntimeError(message)
+        logger.warning(message)
+    return result
+
+
+# A replica that is down at startup doesn't block it: reads fall back (or answer 503) until it returns
+async def warm_replica(replica_engine, replica_router, connections: int):
+    try:
+        await asyncio.wait_for(warm_pool(replica_engine, connections), replica_router.check_timeout)
+    except Exception as exc:
+        logger.warning("read replica unavailable at startup: %s", exc or exc.__class__.__name__)
+        replica_router.mark_down(str(exc) or exc.__class__.__name__)
+        return
+    await replica_router.refresh()
+
+
+# ✅ Lifespan: the app only reports ready once the pools, auth code paths, schema check and partitions are done
+def lifespan(settings: Settings):
+    @asynccontextmanager
+    async def run(app):
+        state = app.state.startup
+        engine = get_engine()
+        replica_engine, replica_router = get_replica_engine(), get_replica_router()
+        started = time.perf_counter()
+
+        phase = time.perf_counter()
+        await warm_pool(engine, settings.warmup_connections)
+        state["timings"]["pool_warmup_s"] = round(time.perf_counter() - phase, 4)
+
+        if replica_engine is not None:
+            phase = time.perf_counter()
+            await warm_replica(replica_engine, replica_router, settings.warmup_connections)
+            state["timings"]["replica_warmup_s"] = round(time.perf_counter() - phase, 4)
+
+        if settings.warmup_auth:
+            phase = time.perf_counter()
+            await warm_auth()
+            state["timings"]["auth_warmup_s"] = round(time.perf_counter() - phase, 4)
+
+        if settings.schema_check != "off":
+            phase = time.perf_counter()
+            state["schema"] = await check_schema(engine, settings.schema_check)
+            state["timings"]["schema_check_s"] = round(time.perf_counter() - phase, 4)
+
+        if settings.partitions_ahead is not None:
+            phase = time.perf_counter()
+            async with engine.begin() as conn:
+                created = await conn.run_sync(ensure_partitions, settings.partitions_ahead)
+            if created:
+                logger.info("created attendance partitions for academic years %s", created)
+            state["timings"]["partitions_s"] = round(time.perf_counter() - phase, 4)
+
+        state["timings"]["startup_s"] = round(time.perf_counter() - started, 4)
+        state["ready"] = True
+        try:
+            yield
+        finally:
+            # Fail readiness first so the load balancer stops routing here while we drain
+            state["ready"] = False
+            await engine.dispose()
+            if replica_engine is not None:
+                await replica_engine.dispose()
+    return run
+
+
+router = APIRouter()
+
+# ✅ Liveness: the process is up and serving (no dependencies checked)
+@router.get("/healthz")
+async def healthz():
+    return {"status": "ok"}
+
+async def ping(engine):
+    async def select_one():
+        async with engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+    await asyncio.wait_for(select_one(), READINESS_DB_TIMEOUT)
+
+# ✅ Readiness: warmup finished and the database answers. A replica that is down only fails readiness
+# when reads would answer 503 without it (REPLICA_FALLBACK=error); otherwise it is reported and reads use the primary.
+@router.get("/readyz")
+async def readyz(request: Request):
+    state = request.app.state.startup
+    body = {"ready": state["ready"], "schema": state["schema"], "timings": state["timings"]}
+    if not state["ready"]:
+        return ORJSONResponse(body, status_code=503)
+    try:
+        await ping(get_engine())
+    except Exception as exc:
+        return ORJSONResponse({**body, "ready": False, "error": str(exc) or exc.__class__.__name__}, status_code=503)
+
+    replica_engine, replica_router = get_replica_engine(), get_replica_router()
+    if replica_engine is not None:
+        try:
+            await ping(replica_engine)
+            body["replica"] = {"reachable": True, **replica_router.status()}
+        except Exception as exc:
+            replica_router.mark_down(str(exc) or exc.__class__.__name__)
+            body["replica"] = {"reachable": False, **replica_router.status()}
+            if replica_router.fallback == "error":
+                return ORJSONResponse({**body, "ready": False}, status_code=503)
+    return body
+
+
+# Import-time breakdown of the startup path, from `python -X importtime` (cumulative microseconds per module)
+def import_times(module: str):
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True, cwd=os.path.dirname(ALEMBIC_INI),
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if cumulative.strip().isdigit():
+            times[name.strip()] = int(cumulative)
+    return result, times
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure import time of the app's startup path")
+    parser.add_argument("--module", default="main")
+    parser.add_argument("--top", type=int, default=25)
+    args = parser.parse_args()
+
+    result, times = import_times(args.module)
+    if result.returncode:
+        errors = [line for line in result.stderr.splitlines() if not line.startswith("import time:")]
+        sys.exit(f"importing {args.module} failed:\n" + "\n".join(errors[-5:]))
+    print(f"{'cumulative ms':>14}  module")
+    for name, micros in sorted(times.items(), key=lambda item: item[1], reverse=True)[:args.top]:
+        print(f"{micros / 1000:>14.1f}  {name}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,68 +1,121 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from database import SessionLocal
-from models import Student, User
-from auth import get_current_user
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+from database import get_db
+from replicas import get_read_db
+from models import Student, Tombstone
+from auth import Principal, get_current_user
+from versions import (
+    ASSESSMENTS_SCOPE,
+    PENDING_CHANGE_SEQ,
+    bump_version,
+    etag_headers,
+    etag_matches,
+    get_version,
+    make_etag,
+    not_modified,
+    roster_scope,
+    stamp_change_seq,
+    student_assessments_scope,
+    student_attendance_scope,
+)
 from pydantic import BaseModel
+from responses import ORJSONResponse
+from typing import List, Optional
 
 router = APIRouter()
 
-# Dependency to get DB Session
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
 # ✅ Pydantic Model for Student Data
 class StudentCreate(BaseModel):
     name: str
     class_name: str
 
+# ✅ Response Model for Student Data
+class StudentOut(BaseModel):
+    id: int
+    name: str
+    class_name: str
+    teacher_id: Optional[int] = None
+
 # ✅ Create a New Student (Only for Teachers/Admins)
 @router.post("/students/")
-def create_student(student: StudentCreate, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+async def create_student(student: StudentCreate, db: AsyncSession = Depends(get_db), current_user: Principal = Depends(get_current_user)):
     if current_user.role not in ["teacher", "admin"]:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Only teachers and admins can add students")
-    
-    new_student = Student(name=student.name, class_name=student.class_name, teacher_id=current_user.id)
+
+    new_student = Student(name=student.name, class_name=student.class_name, teacher_id=current_user.id, change_seq=PENDING_CHANGE_SEQ)
     db.add(new_student)
-    db.commit()
-    db.refresh(new_student)
-    
+    await bump_version(db, roster_scope(current_user.id))
+    await stamp_change_seq(db, Student)
+    await db.commit()
+    await db.refresh(new_student)
+
     return {"message": "Student created successfully", "student_id": new_student.id}
 
 # ✅ Get All Students (Only for Teachers/Admins)
-@router.get("/students/")
-def get_students(db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+@router.get("/students/", response_model=List[StudentOut], response_class=ORJSONResponse)
+async def get_students(request: Request, db: AsyncSession = Depends(get_read_db), current_user: Principal = Depends(get_current_user)):
     if current_user.role not in ["teacher", "admin"]:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Only teachers and admins can view students")
-    
-    students = db.query(Student).filter(Student.teacher_id == current_user.id).all()
-    return students
+
+    # Unchanged roster: answer 304 from the change counter without loading any students
+    scope = roster_scope(current_user.id)
+    etag = make_etag(scope, await get_version(db, scope))
+    if etag_matches(request, etag):
+        return not_modified(etag)
+
+    students = await db.execute(
+        select(Student.id, Student.name, Student.class_name, Student.teacher_id)
+        .filter(Student.teacher_id == current_user.id)
+    )
+    return ORJSONResponse([row._asdict() for row in students], headers=etag_headers(etag))
 
 # ✅ Update Student Information (Only for Teachers/Admins)
 @router.put("/students/{student_id}")
-def update_student(student_id: int, student_data: StudentCreate, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
-    student = db.query(Student).filter(Student.id == student_id, Student.teacher_id == current_user.id).first()
+async def update_student(student_id: int, student_data: StudentCreate, db: AsyncSession = Depends(get_db), current_user: Principal = Depends(get_current_user)):
+    student = await db.scalar(select(Student).filter(Student.id == student_id, Student.teacher_id == current_user.id))
     if not student:
         raise HTTPException(status_code=404, detail="Student not found")
-    
+
+    # Assessment statistics are grouped by class, so moving a student changes them
+    if student.class_name != student_data.class_name:
+        await bump_version(db, ASSESSMENTS_SCOPE)
+    await bump_version(db, roster_scope(current_user.id))
     student.name = student_data.name
     student.class_name = student_data.class_name
-    db.commit()
-    
+    student.change_seq = PENDING_CHANGE_SEQ
+    await stamp_change_seq(db, Student)
+    await db.commit()
+
     return {"message": "Student updated successfully"}
 
 # ✅ Delete a Student (Only for Teachers/Admins)
 @router.delete("/students/{student_id}")
-def delete_student(student_id: int, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
-    student = db.query(Student).filter(Student.id == student_id, Student.teacher_id == current_user.id).first()
+async def delete_student(student_id: int, db: AsyncSession = Depends(get_db), current_user: Principal = Depends(get_current_user)):
+    # Load the cascaded collections up front; async sessions can't lazy-load them during delete
+    student = await db.scalar(
+        select(Student)
+        .options(selectinload(Student.assessments), selectinload(Student.attendance))
+        .filter(Student.id == student_id, Student.teacher_id == current_user.id)
+    )
     if not student:
         raise HTTPException(status_code=404, detail="Student not found")
-    
-    db.delete(student)
-    db.commit()
-    
+
+    await db.delete(student)
+    db.add(Tombstone(
+        entity="students", entity_id=student_id, teacher_id=student.teacher_id, class_name=student.class_name,
+        change_seq=PENDING_CHANGE_SEQ,
+    ))
+    if student.assessments:
+        await bump_version(db, ASSESSMENTS_SCOPE)
+    await bump_version(
+        db,
+        roster_scope(current_user.id),
+        student_attendance_scope(student_id),
+        student_assessments_scope(student_id),
+    )
+    await stamp_change_seq(db, Tombstone)
+    await db.commit()
+
     return {"message": "Student deleted successfully"}
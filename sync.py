@@ -0,0 +1,223 @@
+from datetime import date
+from typing import Annotated, List, Literal, Optional, Union
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from pydantic import BaseModel, Field
+from sqlalchemy import insert, or_, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from database import get_db
+from models import Assessment, Attendance, Student, SyncOperation, Tombstone
+from auth import Principal, get_current_user
+from analytics import apply_attendance_deltas, attendance_deltas
+from attendance import VALID_STATUSES
+from responses import ORJSONResponse
+from versions import (
+    ASSESSMENTS_SCOPE,
+    PENDING_CHANGE_SEQ,
+    SYNC_SCOPE,
+    bump_version,
+    get_version,
+    stamp_change_seq,
+    student_assessments_scope,
+    student_attendance_scope,
+)
+
+router = APIRouter()
+
+SYNC_ROLES = ["field_worker", "teacher", "admin"]
+DEFAULT_SYNC_LIMIT = 500
+MAX_SYNC_LIMIT = 5000
+MAX_PUSH_OPERATIONS = 1000
+
+# ✅ Pydantic Models for queued offline writes; `id` is generated by the client and makes retries idempotent
+class AttendanceOperation(BaseModel):
+    id: str
+    type: Literal["attendance"]
+    student_id: int
+    date: date
+    status: str
+
+class AssessmentOperation(BaseModel):
+    id: str
+    type: Literal["assessment"]
+    student_id: int
+    subject: str
+    score: int
+    exam_date: date
+
+class SyncPush(BaseModel):
+    operations: List[Annotated[Union[AttendanceOperation, AssessmentOperation], Field(discriminator="type")]]
+
+# ✅ Pull Changes since a Cursor (For Field Workers, Teachers & Admins)
+# Returns rows created or updated after `since` (omit it for a full download) plus ids deleted since then.
+# Pass the returned cursor as `since` next time; keep pulling while has_more is true.
+# Teachers receive their own roster only. Each table contributes about `limit` rows per page,
+# but a page never ends in the middle of one write, so nothing is ever skipped.
+@router.get("/sync", response_class=ORJSONResponse)
+async def pull_changes(
+    since: Optional[int] = Query(None, ge=0),
+    class_name: Optional[str] = None,
+    limit: int = Query(DEFAULT_SYNC_LIMIT, ge=1, le=MAX_SYNC_LIMIT),
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_user),
+):
+    if current_user.role not in SYNC_ROLES:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Access denied")
+
+    # Every write numbered up to head has committed, since the counter is bumped in the writing transaction
+    head = await get_version(db, SYNC_SCOPE)
+
+    def changed(query, seq_column):
+        query = query.filter(seq_column <= head)
+        if since is not None:
+            query = query.filter(seq_column > since)
+        if current_user.role == "teacher":
+            query = query.filter(Student.teacher_id == current_user.id)
+        if class_name is not None:
+            query = query.filter(Student.class_name == class_name)
+        return query
+
+    queries = {
+        "students": changed(
+            select(Student.id, Student.name, Student.class_name, Student.teacher_id, Student.updated_at, Student.change_seq),
+            Student.change_seq,
+        ),
+        "attendance": changed(
+            select(Attendance.id, Attendance.student_id, Attendance.date, Attendance.status, Attendance.updated_at, Attendance.change_seq)
+            .join(Student, Student.id == Attendance.student_id),
+            Attendance.change_seq,
+        ),
+        "assessments": changed(
+            select(
+                Assessment.id, Assessment.student_id, Assessment.subject, Assessment.score,
+                Assessment.exam_date, Assessment.updated_at, Assessment.change_seq,
+            )
+            .join(Student, Student.id == Assessment.student_id),
+            Assessment.change_seq,
+        ),
+    }
+    tombstones = select(Tombstone.entity, Tombstone.entity_id, Tombstone.change_seq).filter(Tombstone.change_seq <= head)
+    if since is not None:
+        tombstones = tombstones.filter(Tombstone.change_seq > since)
+    # Scoped like the rows; tombstones written before owners were recorded (NULL) go to every client
+    if current_user.role == "teacher":
+        tombstones = tombstones.filter(or_(Tombstone.teacher_id == current_user.id, Tombstone.teacher_id.is_(None)))
+    if class_name is not None:
+        tombstones = tombstones.filter(or_(Tombstone.class_name == class_name, Tombstone.class_name.is_(None)))
+    seq_columns = {"students": Student.change_seq, "attendance": Attendance.change_seq, "assessments": Assessment.change_seq}
+
+    # The page ends at the smallest sequence number at which some table reaches `limit` rows
+    cursor = head
+    for name, query in [*queries.items(), ("deleted", tombstones)]:
+        seq_column = seq_columns.get(name, Tombstone.change_seq)
+        boundary = await db.scalar(query.with_only_columns(seq_column).order_by(seq_column).offset(limit - 1).limit(1))
+        if boundary is not None:
+            cursor = min(cursor, boundary)
+
+    response = {"cursor": cursor, "has_more": cursor < head, "deleted": {"students": [], "assessments": []}}
+    for name, query in queries.items():
+        rows = await db.execute(query.filter(seq_columns[name] <= cursor).order_by(seq_columns[name]))
+        response[name] = [row._asdict() for row in rows]
+    for entity, entity_id, _ in await db.execute(tombstones.filter(Tombstone.change_seq <= cursor)):
+        response["deleted"][entity].append(entity_id)
+    return ORJSONResponse(response)
+
+# ✅ Push Queued Offline Writes (For Field Workers, Teachers & Admins)
+# All operations are applied in one transaction. Operation ids already applied for this user are reported as
+# "duplicate" and skipped, so a client can resend a batch after a dropped connection without double writes.
+# Attendance for a student and date already on the server is overwritten with the pushed status.
+@router.post("/sync/push")
+async def push_changes(payload: SyncPush, db: AsyncSession = Depends(get_db), current_user: Principal = Depends(get_current_user)):
+    if current_user.role not in SYNC_ROLES:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Access denied")
+    if len(payload.operations) > MAX_PUSH_OPERATIONS:
+        raise HTTPException(status_code=413, detail=f"At most {MAX_PUSH_OPERATIONS} operations per push")
+
+    operation_ids = {operation.id for operation in payload.operations}
+    applied = set(await db.scalars(
+        select(SyncOperation.operation_id)
+        .filter(SyncOperation.user_id == current_user.id, SyncOperation.operation_id.in_(operation_ids))
+    )) if operation_ids else set()
+    student_ids = {operation.student_id for operation in payload.operations}
+    known_students = set(await db.scalars(select(Student.id).filter(Student.id.in_(student_ids)))) if student_ids else set()
+
+    results = []
+    accepted = []
+    for operation in payload.operations:
+        result = {"id": operation.id, "status": "applied"}
+        if operation.id in applied:
+            result["status"] = "duplicate"
+        elif operation.student_id not in known_students:
+            result.update(status="rejected", detail="Student not found")
+        elif operation.type == "attendance" and operation.status not in VALID_STATUSES:
+            result.update(status="rejected", detail="Status must be 'present' or 'absent'")
+        else:
+            applied.add(operation.id)
+            accepted.append(operation)
+        results.append(result)
+
+    if not accepted:
+        return {"change_seq": None, "results": results}
+
+    # Final pushed status per (student, date), compared with what the server already has
+    marks = {(op.student_id, op.date): op.status for op in accepted if op.type == "attendance"}
+    existing = {}
+    if marks:
+        rows = await db.execute(
+            select(Attendance.student_id, Attendance.date, Attendance.id, Attendance.status)
+            .filter(
+                Attendance.student_id.in_({student_id for student_id, _ in marks}),
+                Attendance.date.in_({day for _, day in marks}),
+            )
+        )
+        existing = {(student_id, day): (attendance_id, current) for student_id, day, attendance_id, current in rows}
+
+    new_marks = [
+        {"student_id": student_id, "date": day, "status": mark, "change_seq": PENDING_CHANGE_SEQ}
+        for (student_id, day), mark in marks.items()
+        if (student_id, day) not in existing
+    ]
+    changed_marks = {key: mark for key, mark in marks.items() if key in existing and existing[key][1] != mark}
+    new_assessments = [
+        {
+            "student_id": op.student_id, "subject": op.subject, "score": op.score,
+            "exam_date": op.exam_date, "change_seq": PENDING_CHANGE_SEQ,
+        }
+        for op in accepted if op.type == "assessment"
+    ]
+
+    try:
+        if new_marks:
+            await db.execute(insert(Attendance).values(new_marks))
+        for mark in VALID_STATUSES:
+            keys = [key for key, value in changed_marks.items() if value == mark]
+            if keys:
+                await db.execute(
+                    update(Attendance)
+                    .where(Attendance.date.in_({day for _, day in keys}), Attendance.id.in_([existing[key][0] for key in keys]))
+                    .values(status=mark, change_seq=PENDING_CHANGE_SEQ)
+                    .execution_options(synchronize_session=False)
+                )
+        if new_assessments:
+            await db.execute(insert(Assessment).values(new_assessments))
+        await db.execute(insert(SyncOperation).values([
+            {"user_id": current_user.id, "operation_id": op.id, "change_seq": PENDING_CHANGE_SEQ} for op in accepted
+        ]))
+
+        await apply_attendance_deltas(db, attendance_deltas(
+            (student_id, day, existing[(student_id, day)][1] if (student_id, day) in existing else None, mark)
+            for (student_id, day), mark in marks.items()
+        ))
+        scopes = [student_attendance_scope(row["student_id"]) for row in new_marks]
+        scopes += [student_attendance_scope(student_id) for student_id, _ in changed_marks]
+        if new_assessments:
+            scopes += [ASSESSMENTS_SCOPE, *(student_assessments_scope(row["student_id"]) for row in new_assessments)]
+        await bump_version(db, *scopes)
+        seq = await stamp_change_seq(db, Attendance, Assessment, SyncOperation)
+        await db.commit()
+    except IntegrityError:
+        # The same operations (or marks for the same days) were pushed concurrently
+        await db.rollback()
+        raise HTTPException(status_code=409, detail="Changes were pushed concurrently, please resubmit")
+
+    return {"change_seq": seq, "results": results}
@@ -0,0 +1,37 @@
+import os
+import pytest
+from sqlalchemy import create_engine
+
+# main builds the app at import time; the tests build their own on a fresh database
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from fastapi.testclient import TestClient
+from database import Base
+from main import create_app
+from ratelimit import RATE_LIMIT_MAX_KEYS, InMemoryTokenBuckets, auth_limiter
+from startup import Settings
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    # Login buckets are per process; each test starts with full ones
+    monkeypatch.setattr(auth_limiter, "backend", InMemoryTokenBuckets(RATE_LIMIT_MAX_KEYS))
+    url = f"sqlite:///{tmp_path}/test.db"
+    engine = create_engine(url)
+    Base.metadata.create_all(engine)
+    engine.dispose()
+    settings = Settings(
+        database_url=url, replica_database_url=None, warmup_connections=1,
+        warmup_auth=False, schema_check="off", partitions_ahead=None,
+    )
+    with TestClient(create_app(settings)) as client:
+        yield client
+
+
+@pytest.fixture
+def login(client):
+    def login(email: str, role: str = "teacher") -> dict:
+        client.post("/signup", json={"name": email, "email": email, "password": "pw", "role": role})
+        token = client.post("/token", data={"username": email, "password": "pw"}).json()["access_token"]
+        return {"Authorization": f"Bearer {token}"}
+    return login
@@ -0,0 +1,71 @@
+from datetime import date, timedelta
+from analytics import attendance_deltas, attendance_timeline, days_mask, timeline_summary
+
+
+# Monthly (month, present_bits, marked_bits) rows the way apply_attendance_deltas stores them
+def monthly_rows(marks):
+    deltas = attendance_deltas((1, day, None, status) for day, status in marks.items())
+    return sorted((month, present_bits, marked_bits) for (_, month), (_, _, marked_bits, present_bits) in deltas.items())
+
+def expected_bits(marks, first_day, last_day):
+    present = marked = 0
+    for day, status in marks.items():
+        if first_day <= day <= last_day:
+            marked |= 1 << (day - first_day).days
+            if status == "present":
+                present |= 1 << (day - first_day).days
+    return present, marked
+
+
+def test_days_mask_limits_the_first_and_last_month():
+    assert days_mask(date(2025, 1, 1), date(2025, 1, 30), date(2025, 2, 3)) == 0b11 << 29
+    assert days_mask(date(2025, 2, 1), date(2025, 1, 30), date(2025, 2, 3)) == 0b111
+    assert days_mask(date(2025, 3, 1), date(2025, 2, 15), date(2025, 4, 2)) == (1 << 31) - 1
+    assert days_mask(date(2025, 5, 1), date(2025, 2, 15), date(2025, 4, 2)) == 0
+
+
+def test_timeline_across_month_boundaries():
+    marks = {
+        date(2025, 1, 28): "absent",  # before first_day, must be dropped
+        date(2025, 1, 30): "present",
+        date(2025, 1, 31): "absent",
+        date(2025, 2, 3): "present",
+        date(2025, 2, 28): "absent",
+        date(2025, 3, 3): "present",
+        date(2025, 3, 5): "absent",  # after last_day, must be dropped
+    }
+    first_day, last_day = date(2025, 1, 30), date(2025, 3, 4)
+    assert attendance_timeline(monthly_rows(marks), first_day, last_day) == expected_bits(marks, first_day, last_day)
+
+
+def test_timeline_over_a_school_year_matches_day_by_day_marks():
+    first_day, last_day = date(2024, 8, 1), date(2025, 7, 31)
+    marks = {}
+    day = first_day
+    while day <= last_day:
+        if day.weekday() < 5:
+            marks[day] = "absent" if day.toordinal() % 7 == 0 else "present"
+        day += timedelta(days=1)
+    window = (date(2024, 10, 17), date(2025, 3, 2))
+    assert attendance_timeline(monthly_rows(marks), *window) == expected_bits(marks, *window)
+
+
+def test_summary_counts_rate_and_streak():
+    marks = {
+        date(2025, 1, 29): "present",
+        date(2025, 1, 30): "absent",
+        date(2025, 1, 31): "present",
+        date(2025, 2, 3): "present",  # the weekend between has no marks and doesn't break the streak
+        date(2025, 2, 4): "present",
+    }
+    first_day, last_day = date(2025, 1, 29), date(2025, 2, 4)
+    summary = timeline_summary(*attendance_timeline(monthly_rows(marks), first_day, last_day))
+    assert summary == {"present": 4, "absent": 1, "rate": 0.8, "streak": {"status": "present", "days": 3}}
+
+
+def test_summary_absent_streak_and_empty_timeline():
+    marks = {date(2025, 1, 30): "present", date(2025, 1, 31): "absent", date(2025, 2, 3): "absent"}
+    summary = timeline_summary(*attendance_timeline(monthly_rows(marks), date(2025, 1, 1), date(2025, 2, 28)))
+    assert summary["streak"] == {"status": "absent", "days": 2}
+    assert summary["rate"] == round(1 / 3, 4)
+    assert timeline_summary(0, 0) == {"present": 0, "absent": 0, "rate": None, "streak": None}
@@ -0,0 +1,63 @@
+import asyncio
+import datetime
+from contextlib import asynccontextmanager
+from types import SimpleNamespace
+import pytest
+from fastapi import HTTPException
+from sqlalchemy.exc import IntegrityError, OperationalError
+import coalescing
+from coalescing import AttendanceCoalescer
+
+
+@asynccontextmanager
+async def fake_session():
+    yield None
+
+def mark(student_id):
+    return SimpleNamespace(student_id=student_id, date=datetime.date(2026, 10, 18), status="present")
+
+
+# A batch conflict falls back to one write per mark; an unexpected error there must reach its caller
+# without killing the flusher, so later marks are still written
+def test_flusher_survives_error_in_integrity_fallback(monkeypatch):
+    calls = []
+
+    async def write_marks(db, marks):
+        calls.append([m.student_id for m in marks])
+        if len(calls) == 1:
+            raise IntegrityError("INSERT", {}, Exception("duplicate key"))
+        if marks[0].student_id == 2:
+            raise OperationalError("INSERT", {}, Exception("connection lost"))
+        return [None] * len(marks)
+
+    monkeypatch.setattr(coalescing, "SessionLocal", fake_session)
+    monkeypatch.setattr(coalescing, "write_marks", write_marks)
+
+    async def run():
+        coalescer = AttendanceCoalescer(max_wait_ms=20, max_batch=10)
+        first, second = await asyncio.wait_for(asyncio.gather(
+            coalescer.submit(mark(1)), coalescer.submit(mark(2)), return_exceptions=True
+        ), 1)
+        assert first is None
+        assert isinstance(second, OperationalError)
+        await asyncio.wait_for(coalescer.submit(mark(3)), 1)
+
+    asyncio.run(run())
+    assert calls == [[1, 2], [1], [2], [3]]
+
+
+# If _flush itself raises, waiting callers get a 500 and the flusher keeps serving
+def test_flusher_resolves_futures_when_flush_raises(monkeypatch):
+    async def broken_flush(self, batch):
+        raise RuntimeError("boom")
+
+    async def run():
+        coalescer = AttendanceCoalescer(max_wait_ms=1, max_batch=10)
+        monkeypatch.setattr(AttendanceCoalescer, "_flush", broken_flush)
+        with pytest.raises(HTTPException) as error:
+            await asyncio.wait_for(coalescer.submit(mark(1)), 1)
+        assert error.value.status_code == 500
+        with pytest.raises(HTTPException):
+            await asyncio.wait_for(coalescer.submit(mark(2)), 1)
+
+    asyncio.run(run())
@@ -0,0 +1,87 @@
+from datetime import date
+
+
+def pull_all(client, headers, since=None, limit=2, **params):
+    pages = []
+    while True:
+        query = {"limit": limit, **params, **({"since": since} if since is not None else {})}
+        page = client.get("/sync", params=query, headers=headers).json()
+        pages.append(page)
+        since = page["cursor"]
+        if not page["has_more"]:
+            return pages
+
+
+def add_students(client, headers, names, class_name="5A"):
+    return [client.post("/students/", json={"name": name, "class_name": class_name}, headers=headers).json()["student_id"] for name in names]
+
+
+# Each single write gets its own sequence number, so small pages walk through them in order without gaps or repeats
+def test_pages_cover_every_write_once(client, login):
+    teacher = login("t@x.com")
+    ids = add_students(client, teacher, [f"S{i}" for i in range(5)])
+
+    pages = pull_all(client, teacher, limit=2)
+    students = [row for page in pages for row in page["students"]]
+    assert [row["id"] for row in students] == ids
+    assert all(len(page["students"]) <= 2 for page in pages)
+    seqs = [row["change_seq"] for row in students]
+    assert seqs == sorted(set(seqs))
+    cursors = [page["cursor"] for page in pages]
+    assert cursors == sorted(set(cursors))
+    assert pages[-1]["cursor"] == seqs[-1]
+
+
+# Rows written together share a sequence number; a page may run past `limit` but never splits them
+def test_page_never_splits_one_write(client, login):
+    teacher = login("t@x.com")
+    ids = add_students(client, teacher, ["A", "B", "C"])
+    cursor = pull_all(client, teacher, limit=10)[-1]["cursor"]
+    records = [{"student_id": student_id, "status": "present"} for student_id in ids]
+    assert client.post("/attendance/bulk", json={"class_name": "5A", "date": "2025-02-03", "records": records}, headers=teacher).status_code == 200
+    add_students(client, teacher, ["D"])
+
+    first = client.get("/sync", params={"since": cursor, "limit": 2}, headers=teacher).json()
+    assert sorted(row["student_id"] for row in first["attendance"]) == ids
+    assert first["students"] == []
+    assert first["has_more"]
+    second = client.get("/sync", params={"since": first["cursor"], "limit": 2}, headers=teacher).json()
+    assert [row["name"] for row in second["students"]] == ["D"]
+    assert second["attendance"] == [] and not second["has_more"]
+
+
+# A delete after the client's cursor arrives as a tombstone, scoped to the teacher who owned the row
+def test_delete_after_cursor_is_pulled_as_tombstone(client, login):
+    teacher, other = login("t@x.com"), login("o@x.com")
+    kept, removed = add_students(client, teacher, ["Kept", "Removed"])
+    add_students(client, other, ["Theirs"])
+    cursor = pull_all(client, teacher)[-1]["cursor"]
+    other_cursor = pull_all(client, other)[-1]["cursor"]
+
+    assert client.delete(f"/students/{removed}", headers=teacher).status_code == 200
+    client.put(f"/students/{kept}", json={"name": "Kept", "class_name": "5B"}, headers=teacher)
+
+    pages = pull_all(client, teacher, since=cursor, limit=1)
+    assert [student_id for page in pages for student_id in page["deleted"]["students"]] == [removed]
+    assert [row["id"] for page in pages for row in page["students"]] == [kept]
+    assert pull_all(client, other, since=other_cursor)[-1]["deleted"] == {"students": [], "assessments": []}
+
+    # A full download never sees the deleted row
+    full = pull_all(client, teacher, limit=1)
+    assert removed not in [row["id"] for page in full for row in page["students"]]
+
+
+# Writes stamped through stamp_change_seq take the next sequence number, and the cursor only moves forward
+def test_cursor_at_head_returns_nothing_new(client, login):
+    teacher = login("t@x.com")
+    add_students(client, teacher, ["A"])
+    head = pull_all(client, teacher)[-1]["cursor"]
+    page = client.get("/sync", params={"since": head}, headers=teacher).json()
+    assert page == {"cursor": head, "has_more": False, "deleted": {"students": [], "assessments": []}, "students": [], "attendance": [], "assessments": []}
+
+    student_id = add_students(client, teacher, ["B"])[0]
+    client.post("/attendance/", json={"student_id": student_id, "date": str(date(2025, 2, 4)), "status": "absent"}, headers=teacher)
+    page = client.get("/sync", params={"since": head}, headers=teacher).json()
+    assert page["cursor"] == head + 2
+    assert [row["change_seq"] for row in page["students"]] == [head + 1]
+    assert [row["change_seq"] for row in page["attendance"]] == [head + 2]
@@ -0,0 +1,107 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from fastapi import Request, Response
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from database import dialect_insert
+from models import DataVersion
+
+ASSESSMENTS_SCOPE = "assessments"
+# Global change sequence stamped on synced rows (students, attendance, assessments, tombstones)
+SYNC_SCOPE = "sync"
+# Placeholder change_seq for rows written by the current transaction until stamp_change_seq() runs
+PENDING_CHANGE_SEQ = -1
+
+# Per-teacher roster and per-student list scopes, used for ETags
+def roster_scope(teacher_id: int) -> str:
+    return f"roster:{teacher_id}"
+
+def student_attendance_scope(student_id: int) -> str:
+    return f"attendance:student:{student_id}"
+
+def student_assessments_scope(student_id: int) -> str:
+    return f"assessments:student:{student_id}"
+
+# ✅ Bump change counters inside the caller's transaction.
+# Scopes are deduplicated and sorted so concurrent writers lock rows in the same order.
+async def bump_version(db: AsyncSession, *scopes: str):
+    rows = [{"scope": scope, "version": 1} for scope in sorted(set(scopes))]
+    if not rows:
+        return
+    statement = dialect_insert(db, DataVersion).values(rows)
+    statement = statement.on_conflict_do_update(
+        index_elements=[DataVersion.scope],
+        set_={"version": DataVersion.version + 1},
+    )
+    await db.execute(statement)
+
+# Bump the global change sequence; the counter row then stays locked until the transaction ends
+async def next_change_seq(db: AsyncSession) -> int:
+    statement = dialect_insert(db, DataVersion).values(scope=SYNC_SCOPE, version=1)
+    statement = statement.on_conflict_do_update(
+        index_elements=[DataVersion.scope],
+        set_={"version": DataVersion.version + 1},
+    ).returning(DataVersion.version)
+    return await db.scalar(statement)
+
+# ✅ Allocate the change sequence and stamp it on every row of `models` this transaction wrote with
+# PENDING_CHANGE_SEQ. Call it last, right before commit: the counter lock serializes writers only for
+# the stamp and the commit (so sequence order is still commit order), and while holding it a writer only
+# touches rows it already owns, so it can't deadlock. Other transactions' pending rows are invisible here.
+async def stamp_change_seq(db: AsyncSession, *models) -> int:
+    await db.flush()
+    seq = await next_change_seq(db)
+    for model in models:
+        await db.execute(
+            update(model)
+            .where(model.change_seq == PENDING_CHANGE_SEQ)
+            .values(change_seq=seq)
+            .execution_options(synchronize_session="evaluate")
+        )
+    return seq
+
+# ✅ Current change counter for a scope (0 if it was never written)
+async def get_version(db: AsyncSession, scope: str) -> int:
+    version = await db.scalar(select(DataVersion.version).filter(DataVersion.scope == scope))
+    return version or 0
+
+# Bounded LRU of computed results; an entry only counts as a hit while its data version is current
+class VersionedCache:
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, version: int):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != version:
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key, version: int, value):
+        with self._lock:
+            self._entries[key] = (version, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+# ✅ Weak ETag for a scope version; variant distinguishes different views (e.g. query strings) of the same data
+def make_etag(scope: str, version: int, variant: str = "") -> str:
+    digest = hashlib.sha1(f"{scope}:{version}:{variant}".encode()).hexdigest()[:20]
+    return f'W/"{digest}"'
+
+def etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    return header.strip() == "*" or etag in [tag.strip() for tag in header.split(",")]
+
+# Clients may cache but must revalidate with If-None-Match on every use
+def etag_headers(etag: str) -> dict:
+    return {"ETag": etag, "Cache-Control": "private, no-cache"}
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=304, headers=etag_headers(etag))